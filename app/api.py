@@ -0,0 +1,146 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app.engine import RAGEngine
+from app.jobs import INGEST_WORKERS, IngestQueue, IngestWorker
+from app.tenants import TenantRegistry
+from app.utils.metrics import METRICS
+
+
+class QueryRequest(BaseModel):
+    question: str
+    n_results: int = 5
+    web_search: bool = False
+    # Tenant whose documents are searched; None uses the shared default collection
+    tenant: Optional[str] = None
+
+
+@lru_cache(maxsize=1)
+def get_default_engine() -> RAGEngine:
+    """
+    Build the engine of the shared collection once per worker process.
+    """
+    return RAGEngine()
+
+
+@lru_cache(maxsize=1)
+def get_tenants() -> TenantRegistry:
+    return TenantRegistry(embedding_function=get_default_engine().vector_store.embedding_function)
+
+
+def get_engine(tenant: Optional[str] = None) -> RAGEngine:
+    return get_tenants().get(tenant) if tenant else get_default_engine()
+
+
+@lru_cache(maxsize=1)
+def get_ingest_queue() -> IngestQueue:
+    return IngestQueue()
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    # Open the vector store and load its indexes before accepting requests
+    engine = await asyncio.to_thread(get_default_engine)
+    timings = await asyncio.to_thread(engine.vector_store.warm)
+    print(f"Warm start: {timings}")
+    # Index uploaded files in the background, in the process that serves their queries
+    worker = IngestWorker(get_ingest_queue(), get_engine).start() if INGEST_WORKERS else None
+    yield
+    if worker is not None:
+        worker.stop(timeout=0)
+
+
+app = FastAPI(title="LuminaRAG", description="Query API for indexed documents", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    # Opening the engine and reading the manifest block, so keep them off the event loop
+    engine = await asyncio.to_thread(get_engine)
+    indexed_files = await asyncio.to_thread(engine.indexed_files)
+    return {"status": "ok", "indexed_files": len(indexed_files)}
+
+
+@app.get("/files")
+async def files(tenant: Optional[str] = Query(None)):
+    engine = await asyncio.to_thread(get_engine, tenant)
+    return {"files": await asyncio.to_thread(engine.indexed_files)}
+
+
+@app.post("/query")
+async def query(request: QueryRequest):
+    # The engine is blocking, so run it off the event loop
+    engine = await asyncio.to_thread(get_engine, request.tenant)
+    return await asyncio.to_thread(
+        engine.answer, request.question, n_results=request.n_results, web_search=request.web_search
+    )
+
+
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    engine = await asyncio.to_thread(get_engine, request.tenant)
+    result, tokens = await asyncio.to_thread(
+        engine.answer_stream, request.question, n_results=request.n_results, web_search=request.web_search
+    )
+    # Starlette iterates synchronous generators in a worker thread
+    return StreamingResponse(tokens, media_type="text/plain; charset=utf-8",
+                             headers={"X-Trace-Id": result["trace_id"]})
+
+
+@app.post("/retrieve")
+async def retrieve(request: QueryRequest):
+    engine = await asyncio.to_thread(get_engine, request.tenant)
+    docs = await asyncio.to_thread(engine.retrieve, request.question, n_results=request.n_results)
+    return {"documents": docs}
+
+
+@app.post("/jobs")
+async def enqueue_jobs(files: List[UploadFile] = File(...), tenant: Optional[str] = Form(None)):
+    """
+    Queue uploaded PDFs for background indexing; poll GET /jobs for their progress.
+    """
+    queue = get_ingest_queue()
+    ids = []
+    for upload in files:
+        ids.append(await asyncio.to_thread(queue.enqueue, upload.file, tenant or "", upload.filename))
+    return {"jobs": ids}
+
+
+@app.get("/jobs")
+async def list_jobs(tenant: Optional[str] = Query(None), status: Optional[str] = Query(None), limit: int = 200):
+    queue = get_ingest_queue()
+    jobs = await asyncio.to_thread(queue.jobs, tenant or "", status, limit)
+    return {"summary": queue.summary(tenant or ""), "jobs": jobs}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int):
+    job = await asyncio.to_thread(get_ingest_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(METRICS.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/json")
+async def metrics_json(traces: int = 20):
+    return METRICS.to_dict(traces=traces)
+
+
+@app.get("/traces/{trace_id}")
+async def trace(trace_id: str):
+    found = METRICS.get_trace(trace_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired trace id")
+    return found.to_dict()
@@ -0,0 +1,280 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.engine import (
+    CHUNKER,
+    COLLECTION_NAME,
+    EMBEDDINGS,
+    VECTOR_DB_PATH,
+    RAGEngine,
+    build_embedding_function,
+    open_local_files,
+)
+from app.jobs import INGEST_BATCH_FILES, INGEST_WORKERS, QUEUE_FILE, IngestQueue, IngestWorker
+from app.retrieval.manifest import QuotaExceededError
+from app.retrieval.rerank import Reranker, build_scorer
+from app.retrieval.snapshot import restore_snapshot
+from app.tenants import TenantRegistry
+
+
+def _expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(sorted(glob.glob(os.path.join(pattern, "**", "*.pdf"), recursive=True)))
+        else:
+            paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+
+def _chunking_kwargs(args):
+    if not getattr(args, "chunker", None):
+        return {}
+    return {"chunker": args.chunker, "chunk_size": args.chunk_size, "chunk_overlap": args.chunk_overlap}
+
+
+def _build_engine(args):
+    if args.tenant:
+        registry = TenantRegistry(
+            args.db, args.collection, max_open=1,
+            embedding_function=build_embedding_function(args.db, args.embeddings),
+            reset_on_embedding_change=getattr(args, "reindex", False),
+            **_chunking_kwargs(args),
+        )
+        return registry.get(args.tenant)
+    return RAGEngine(
+        persist_directory=args.db,
+        collection_name=args.collection,
+        embedding_function=build_embedding_function(args.db, args.embeddings),
+        reset_on_embedding_change=getattr(args, "reindex", False),
+        **_chunking_kwargs(args),
+    )
+
+
+def cmd_ingest(args):
+    engine = _build_engine(args)
+    files = open_local_files(_expand_paths(args.paths))
+    try:
+        indexed, removed = engine.ingest(
+            files,
+            streaming=args.streaming,
+            prune=args.prune,
+            on_indexed=lambda name: print(f"Ingested and indexed: {name}"),
+        )
+    except QuotaExceededError as e:
+        sys.exit(f"error: {e}")
+    finally:
+        for file in files:
+            file.close()
+    print(f"{len(indexed)} indexed, {len(files) - len(indexed)} unchanged or failed, {len(removed)} removed")
+
+
+def _queue(args) -> IngestQueue:
+    return IngestQueue(os.path.join(args.db, QUEUE_FILE))
+
+
+def cmd_enqueue(args):
+    queue = _queue(args)
+    files = open_local_files(_expand_paths(args.paths))
+    try:
+        for file in files:
+            print(f"Queued {file.name} as job {queue.enqueue(file, tenant=args.tenant or '')}")
+    finally:
+        for file in files:
+            file.close()
+
+
+def cmd_worker(args):
+    embedding_function = build_embedding_function(args.db, args.embeddings)
+    registry = TenantRegistry(args.db, args.collection, max_open=args.threads, embedding_function=embedding_function)
+
+    @lru_cache(maxsize=1)
+    def default_engine():
+        return RAGEngine(persist_directory=args.db, collection_name=args.collection,
+                         embedding_function=embedding_function)
+
+    worker = IngestWorker(_queue(args), lambda tenant: registry.get(tenant) if tenant else default_engine(),
+                          threads=args.threads, batch_files=args.batch_files)
+    if args.until_empty:
+        print(f"{worker.run_until_empty()} job(s) processed")
+        return
+    worker.start()
+    print(f"Ingest worker running with {args.threads} thread(s); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        # Jobs interrupted here are requeued by the next worker
+        pass
+
+
+def cmd_jobs(args):
+    queue = _queue(args)
+    tenant = args.tenant
+    jobs = queue.jobs(tenant=tenant, status=args.status, limit=args.limit)
+    if args.json:
+        print(json.dumps({"summary": queue.summary(tenant), "jobs": jobs}, indent=2))
+        return
+    for job in jobs:
+        print(f"{job['id']:>6}  {job['status']:<8} {job['progress']:6.0%}  {job['tenant'] or '-':<20} "
+              f"{job['file_name']}" + (f"  ({job['error']})" if job["error"] else ""))
+    print(", ".join(f"{count} {status}" for status, count in queue.summary(tenant).items()))
+
+
+def cmd_query(args):
+    engine = _build_engine(args)
+    if args.min_similarity is not None:
+        engine.similarity_threshold = args.min_similarity
+    if args.max_context_tokens is not None:
+        engine.max_context_tokens = args.max_context_tokens
+    if args.rerank:
+        engine.reranker = Reranker(build_scorer(args.rerank))
+    if args.stream and not args.json:
+        result, tokens = engine.answer_stream(args.question, n_results=args.n_results, web_search=args.web)
+        for text in tokens:
+            print(text, end="", flush=True)
+        print()
+    else:
+        result = engine.answer(args.question, n_results=args.n_results, web_search=args.web)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print(result["answer"])
+    if args.trace:
+        print(f"trace {result['trace_id']}", file=sys.stderr)
+        for stage_name, duration_ms in sorted(result["timings"].items(), key=lambda item: -item[1]):
+            print(f"  {stage_name:<24} {duration_ms:10.1f} ms", file=sys.stderr)
+
+
+def cmd_retrieve_batch(args):
+    engine = _build_engine(args)
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    where = {"file_name": args.file_name} if args.file_name else None
+    results = engine.vector_store.query_batch(questions, n_results=args.n_results, where=where,
+                                              batch_size=args.batch_size)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for question, hits in zip(questions, results):
+            out.write(json.dumps({"question": question, "hits": hits}) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def cmd_compact(args):
+    engine = _build_engine(args)
+    stats = engine.vector_store.compact()
+    print(f"{stats['chunks']} chunks kept, {stats['orphaned_segments']} orphaned index directories removed, "
+          f"{stats['bytes_before'] / 2 ** 20:.1f} MiB -> {stats['bytes_after'] / 2 ** 20:.1f} MiB")
+
+
+def cmd_snapshot(args):
+    engine = _build_engine(args)
+    print(f"Snapshot written to {engine.vector_store.snapshot(args.destination)}")
+
+
+def cmd_restore(args):
+    print(f"Restored {restore_snapshot(args.snapshot, args.db)} from {args.snapshot}")
+
+
+def cmd_serve(args):
+    import uvicorn
+    os.environ["LUMINARAG_VECTOR_DB"] = args.db
+    os.environ["LUMINARAG_COLLECTION"] = args.collection
+    os.environ["LUMINARAG_EMBEDDINGS"] = args.embeddings
+    uvicorn.run("app.api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="luminarag", description="LuminaRAG headless ingestion and query tools")
+    parser.add_argument("--db", default=VECTOR_DB_PATH, help="Chroma persist directory")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Collection name")
+    parser.add_argument("--tenant", help="Use the tenant's own collection (with per-tenant quotas)")
+    parser.add_argument("--embeddings", default=EMBEDDINGS,
+                        help='Embedding provider: "google[:<model>]", "local[:<model>]" or "hashing[:<dimension>]"')
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Index PDF files or directories")
+    ingest.add_argument("paths", nargs="+", help="PDF files, glob patterns or directories")
+    ingest.add_argument("--streaming", action="store_true", help="Parse page by page with bounded memory")
+    ingest.add_argument("--prune", action="store_true", help="Remove indexed files not given on the command line")
+    ingest.add_argument("--reindex", action="store_true",
+                        help="Drop the index if it was built with another embedding model")
+    ingest.add_argument("--chunker", default=CHUNKER,
+                        help='Splitter: "recursive" (characters) or "token[:<tiktoken encoding>]"; '
+                             "files indexed with other chunking are re-indexed")
+    ingest.add_argument("--chunk-size", type=int, help="Chunk size in the chunker's unit")
+    ingest.add_argument("--chunk-overlap", type=int, help="Chunk overlap in the chunker's unit")
+    ingest.set_defaults(func=cmd_ingest)
+
+    query = subparsers.add_parser("query", help="Answer a question from the indexed documents")
+    query.add_argument("question")
+    query.add_argument("-k", "--n-results", type=int, default=5, help="Number of chunks retrieved")
+    query.add_argument("--min-similarity", type=float, help="Drop chunks below this similarity")
+    query.add_argument("--max-context-tokens", type=int, help="Token budget of the context sent to the LLM")
+    query.add_argument("--rerank", help='Rerank candidates with "lexical" or "cross-encoder[:<model>]"')
+    query.add_argument("--web", action="store_true", help="Fall back to web search when nothing is retrieved")
+    query.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    query.add_argument("--stream", action="store_true", help="Print the answer as it is generated")
+    query.add_argument("--trace", action="store_true", help="Print per-stage timings to stderr")
+    query.set_defaults(func=cmd_query)
+
+    retrieve_batch = subparsers.add_parser("retrieve-batch", help="Retrieve chunks for a file of questions (one per line)")
+    retrieve_batch.add_argument("questions", help="Text file with one question per line")
+    retrieve_batch.add_argument("-k", "--n-results", type=int, default=5, help="Number of chunks per question")
+    retrieve_batch.add_argument("--file-name", help="Only search chunks of this indexed file")
+    retrieve_batch.add_argument("--batch-size", type=int, default=64, help="Questions embedded and searched per call")
+    retrieve_batch.add_argument("-o", "--output", help="Write JSON lines here instead of stdout")
+    retrieve_batch.set_defaults(func=cmd_retrieve_batch)
+
+    compact = subparsers.add_parser("compact", help="Reclaim space left by deleted chunks (run while the API is stopped)")
+    compact.set_defaults(func=cmd_compact)
+
+    snapshot = subparsers.add_parser("snapshot", help="Write an atomic snapshot of the vector database")
+    snapshot.add_argument("destination", help="Snapshot directory to create")
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    restore = subparsers.add_parser("restore", help="Replace the vector database with a snapshot (run while stopped)")
+    restore.add_argument("snapshot", help="Snapshot directory written by the snapshot command")
+    restore.set_defaults(func=cmd_restore)
+
+    enqueue = subparsers.add_parser("enqueue", help="Queue PDF files for background indexing")
+    enqueue.add_argument("paths", nargs="+", help="PDF files, glob patterns or directories")
+    enqueue.set_defaults(func=cmd_enqueue)
+
+    worker = subparsers.add_parser("worker", help="Index queued files (run while the API is stopped)")
+    worker.add_argument("--until-empty", action="store_true", help="Exit once the queue is drained")
+    worker.add_argument("--threads", type=int, default=INGEST_WORKERS, help="Tenants indexed concurrently")
+    worker.add_argument("--batch-files", type=int, default=INGEST_BATCH_FILES,
+                        help="Files claimed and parsed together")
+    worker.set_defaults(func=cmd_worker)
+
+    jobs = subparsers.add_parser("jobs", help="Show the status of queued and recent ingestion jobs")
+    jobs.add_argument("--status", help="Only jobs in this status (queued, running, done, skipped, failed)")
+    jobs.add_argument("--limit", type=int, default=50, help="Number of most recent jobs shown")
+    jobs.add_argument("--json", action="store_true", help="Print the jobs as JSON")
+    jobs.set_defaults(func=cmd_jobs)
+
+    serve = subparsers.add_parser("serve", help="Run the HTTP query API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
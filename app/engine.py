@@ -0,0 +1,396 @@
+import io
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.retrieval.chunker import DEFAULT_CHUNKING
+from app.retrieval.embedding_cache import CachedEmbeddings
+from app.retrieval.embeddings import build_embeddings
+from app.retrieval.ingest import process_pdfs_parallel, process_pdfs_streaming
+from app.retrieval.manifest import IngestManifest, chunking_key, sync_uploaded_files
+from app.orchestrator import gather_context
+from app.retrieval.context import filter_by_similarity, merge_overlapping_chunks, pack_context
+from app.retrieval.rerank import Reranker, build_scorer
+from app.retrieval.vectorstore import VectorStore
+from app.utils.answer_cache import SemanticAnswerCache, context_fingerprint
+from app.utils.metrics import activate, cache_lookup, finish_trace, start_trace, traced
+from app.utils.http_client import ProviderError
+from app.utils.deepseek_llm import (
+    call_groq_deepseek,
+    filter_think_tags,
+    filter_think_tags_stream,
+    stream_groq_deepseek,
+)
+
+load_dotenv()
+
+VECTOR_DB_PATH = os.getenv("LUMINARAG_VECTOR_DB", "./vector_db")
+COLLECTION_NAME = os.getenv("LUMINARAG_COLLECTION", "luminarag_docs")
+EMBEDDING_MODEL_NAME = "models/embedding-001"
+# "google[:<model>]", "local[:<model>]" (sentence-transformers on CPU) or "hashing[:<dimension>]"
+EMBEDDINGS = os.getenv("LUMINARAG_EMBEDDINGS", f"google:{EMBEDDING_MODEL_NAME}")
+SIMILARITY_THRESHOLD = float(os.getenv("LUMINARAG_SIMILARITY_THRESHOLD", "0.5"))
+MAX_CONTEXT_TOKENS = int(os.getenv("LUMINARAG_MAX_CONTEXT_TOKENS", "3000"))
+# "lexical", "cross-encoder" or "cross-encoder:<model>"; empty disables reranking
+RERANKER = os.getenv("LUMINARAG_RERANKER", "")
+RERANK_CANDIDATES = int(os.getenv("LUMINARAG_RERANK_CANDIDATES", "50"))
+# "recursive" (character-based) or "token" / "token:<tiktoken encoding>"; changing it re-indexes files
+CHUNKER = os.getenv("LUMINARAG_CHUNKER", "recursive")
+
+
+def build_embedding_function(persist_directory: str = VECTOR_DB_PATH, spec: str = EMBEDDINGS):
+    """
+    Build the configured embedding provider wrapped in the persistent embedding cache.
+    """
+    return CachedEmbeddings(
+        build_embeddings(spec),
+        path=os.path.join(persist_directory, "embedding_cache.sqlite"),
+    )
+
+
+def open_local_files(paths: List[str]) -> List[io.FileIO]:
+    """
+    Open PDF files from disk as file-like objects named by their base name, like Streamlit uploads.
+    """
+    files = []
+    for path in paths:
+        file = io.FileIO(path, "rb")
+        file.name = os.path.basename(path)
+        files.append(file)
+    return files
+
+
+class RAGEngine:
+    """
+    UI-independent RAG pipeline: ingest PDFs, retrieve chunks and answer questions.
+    Shared by the Streamlit app, the CLI and the HTTP API.
+    """
+
+    def __init__(self, persist_directory: str = VECTOR_DB_PATH, collection_name: str = COLLECTION_NAME,
+                 embedding_function=None, answer_cache=None, retrieval_timeout: float = 10.0,
+                 web_timeout: float = 15.0, similarity_threshold: Optional[float] = SIMILARITY_THRESHOLD,
+                 max_context_tokens: Optional[int] = MAX_CONTEXT_TOKENS, reranker=None,
+                 rerank_candidates: int = RERANK_CANDIDATES, reset_on_embedding_change: bool = False,
+                 manifest_path: Optional[str] = None, max_files: Optional[int] = None,
+                 max_chunks: Optional[int] = None, chunker: str = CHUNKER,
+                 chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+        """
+        Args:
+            persist_directory: Directory of the persistent Chroma database
+            collection_name: Name of the collection holding document chunks
+            embedding_function: Embedder to use (defaults to cached Google embeddings)
+            answer_cache: SemanticAnswerCache in front of the LLM (a default one is created; pass False to disable)
+            retrieval_timeout: Deadline in seconds for document retrieval
+            web_timeout: Deadline in seconds for the speculative web search
+            similarity_threshold: Minimum similarity of a retrieved chunk (None keeps everything)
+            max_context_tokens: Token budget of the context sent to the LLM (None for no limit)
+            reranker: Reranker applied to over-fetched candidates (defaults to LUMINARAG_RERANKER)
+            rerank_candidates: Number of candidates retrieved for reranking
+            reset_on_embedding_change: Drop the index instead of failing when the collection was
+                built with another embedding model
+            manifest_path: Ingest manifest of the collection (defaults to ingest_manifest.json
+                in persist_directory)
+            max_files: Maximum number of indexed files (None for no limit)
+            max_chunks: Maximum number of indexed chunks (None for no limit)
+            chunker: Splitter used at ingest time (see get_splitter)
+            chunk_size: Chunk size in the chunker's unit (defaults per chunker)
+            chunk_overlap: Chunk overlap in the chunker's unit (defaults per chunker)
+        """
+        if embedding_function is None:
+            embedding_function = build_embedding_function(persist_directory)
+        self.vector_store = VectorStore(
+            persist_directory=persist_directory,
+            collection_name=collection_name,
+            embedding_function=embedding_function,
+            reset_on_mismatch=reset_on_embedding_change,
+        )
+        manifest_path = manifest_path or os.path.join(persist_directory, "ingest_manifest.json")
+        if self.vector_store.was_reset and os.path.exists(manifest_path):
+            # Every file has to be re-embedded with the new model
+            os.remove(manifest_path)
+            IngestManifest(manifest_path).save()
+        elif not os.path.exists(manifest_path):
+            # Chunks indexed before the manifest existed cannot be tracked, so start clean once
+            self.vector_store.delete(ids=self.vector_store.collection.get()["ids"])
+            IngestManifest(manifest_path).save()
+        self.manifest = IngestManifest(manifest_path)
+        self.answer_cache = SemanticAnswerCache() if answer_cache is None else answer_cache
+        self.retrieval_timeout = retrieval_timeout
+        self.web_timeout = web_timeout
+        self.similarity_threshold = similarity_threshold
+        self.max_context_tokens = max_context_tokens
+        if reranker is None and RERANKER:
+            reranker = Reranker(build_scorer(RERANKER))
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+        self.max_files = max_files
+        self.max_chunks = max_chunks
+        default_size, default_overlap = DEFAULT_CHUNKING[chunker.partition(":")[0]]
+        self.chunker = chunker
+        self.chunk_size = chunk_size or default_size
+        self.chunk_overlap = default_overlap if chunk_overlap is None else chunk_overlap
+        # Ingestion (foreground or from the job queue) and file removal update the manifest one at a
+        # time; the manifest's file lock extends this to other engines and processes
+        self._ingest_lock = threading.RLock()
+
+    def indexed_files(self) -> List[str]:
+        # Another process (API worker, Streamlit, CLI) may have indexed or removed files meanwhile
+        self.manifest.refresh()
+        return self.manifest.file_names()
+
+    def ingest(self, files, streaming: bool = False, prune: bool = True, on_indexed=None, on_progress=None):
+        """
+        Index uploaded or local PDF files, skipping the ones already indexed unchanged.
+        Args:
+            files: File-like objects with a ``name`` attribute
+            streaming: Parse page by page with bounded memory instead of on a process pool
+            prune: Treat files as the whole corpus and drop indexed files not among them
+            on_indexed: Optional callback invoked with the name of each newly indexed file
+            on_progress: Optional callback invoked with (file name, chunks indexed, total chunks)
+                after each indexed batch
+        Returns:
+            Tuple[List[str], List[str]]: Names of files indexed and names of files removed
+        Raises:
+            QuotaExceededError: If the files would exceed max_files or max_chunks
+        """
+        with self._ingest_lock, self.manifest.locked():
+            return sync_uploaded_files(
+                self.vector_store,
+                self.manifest,
+                files,
+                process_pdfs_streaming if streaming else process_pdfs_parallel,
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                chunker=self.chunker,
+                on_indexed=on_indexed,
+                on_progress=on_progress,
+                prune=prune,
+                max_files=self.max_files,
+                max_chunks=self.max_chunks,
+            )
+
+    def busy(self) -> bool:
+        """
+        Return True while another thread is ingesting or removing files with this engine.
+        """
+        if not self._ingest_lock.acquire(blocking=False):
+            return True
+        self._ingest_lock.release()
+        return False
+
+    @property
+    def chunking(self) -> str:
+        """
+        Manifest key of the chunking settings files are indexed with.
+        """
+        return chunking_key(self.chunk_size, self.chunk_overlap, self.chunker)
+
+    def remove_files(self, names: List[str]) -> List[str]:
+        """
+        Drop indexed files and their chunks.
+        Returns:
+            List[str]: Names of the files that were indexed and are now removed
+        """
+        with self._ingest_lock, self.manifest.locked():
+            indexed = set(self.manifest.file_names())
+            removed = [name for name in names if name in indexed]
+            stale_ids = [chunk_id for name in removed for chunk_id in self.manifest.remove(name)]
+            self.vector_store.delete(ids=stale_ids)
+            self.manifest.save()
+        return removed
+
+    def retrieve_hits(self, question: str, n_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        Retrieve hits for the question (hybrid BM25 + dense retrieval), drop those below the
+        similarity threshold, optionally rerank over-fetched candidates, merge chunks repeated
+        by the splitter overlap and pack the rest into the context token budget.
+        """
+        if self.reranker:
+            hits = self.vector_store.search(question, n_results=max(n_results, self.rerank_candidates),
+                                            candidates=max(20, self.rerank_candidates))
+            hits = filter_by_similarity(hits, self.similarity_threshold)
+            hits = self.reranker.rerank(question, hits, top_k=n_results)
+        else:
+            hits = self.vector_store.search(question, n_results=n_results)
+            hits = filter_by_similarity(hits, self.similarity_threshold)
+        hits = merge_overlapping_chunks(hits)
+        return pack_context(hits, self.max_context_tokens)
+
+    def _retrieve_with_ids(self, question: str, n_results: int):
+        hits = self.retrieve_hits(question, n_results=n_results)
+        return [hit["document"] for hit in hits], [hit["id"] for hit in hits]
+
+    def retrieve(self, question: str, n_results: int = 5) -> List[str]:
+        """
+        Return the texts of the chunks most relevant to the question.
+        """
+        return self._retrieve_with_ids(question, n_results)[0]
+
+    def _gather_context(self, question: str, n_results: int, web_search: bool):
+        """
+        Retrieve chunks and, when enabled, search the web concurrently.
+        Returns:
+            Tuple[List[str], List[str], Optional[str], Dict[str, float]]: docs, chunk ids,
+            web results (None unless retrieval found nothing) and stage timings
+        """
+        web_fn = None
+        if web_search:
+            from app.utils.web_search import duckduckgo_search
+            web_fn = lambda: duckduckgo_search(question)
+        context = gather_context(
+            lambda: self._retrieve_with_ids(question, n_results),
+            web_fn,
+            retrieval_timeout=self.retrieval_timeout,
+            web_timeout=self.web_timeout,
+            accept=lambda retrieval: bool(retrieval[0]),
+        )
+        docs, ids = context["retrieval"] or ([], [])
+        return docs, ids, context["web_results"], context["timings"]
+
+    def _lookup_cached(self, question: str, docs: List[str], ids: List[str], web_search: bool):
+        """
+        Return (cached result or None, query embedding, context fingerprint) for the answer cache.
+        """
+        embedder = self.vector_store.embedding_function
+        if not self.answer_cache or not hasattr(embedder, "embed_query"):
+            return None, None, None
+        # Already computed (and cached) by the retrieval step
+        query_embedding = embedder.embed_query(question)
+        fingerprint = context_fingerprint(ids, "web" if web_search and not docs else "")
+        cached = self.answer_cache.get(query_embedding, fingerprint)
+        cache_lookup("answer", hits=int(cached is not None), misses=int(cached is None))
+        return cached, query_embedding, fingerprint
+
+    def _store_answer(self, query_embedding, fingerprint, result: Dict[str, Any]):
+        if query_embedding is not None and not result["error"]:
+            self.answer_cache.put(query_embedding, fingerprint, result)
+
+    def answer(self, question: str, n_results: int = 5, web_search: bool = False) -> Dict[str, Any]:
+        """
+        Answer a question from the indexed documents, falling back to web search when enabled.
+        The web search runs speculatively alongside retrieval and is dropped if documents are found.
+        Answers to similar questions over the same retrieved chunks are served from the answer cache.
+        Args:
+            question: The user's question
+            n_results: Number of chunks retrieved as context
+            web_search: Search the web and summarize with Gemini when no chunks are found
+        Returns:
+            Dict[str, Any]: ``answer`` (think tags removed), ``raw_answer``, ``context``,
+            ``source`` ("documents", "web" or "llm"), ``cached``, ``error`` (None, or the LLM error
+            shown as the answer), ``trace_id`` and per-stage ``timings``
+        """
+        with traced("question", n_results=n_results, web_search=web_search) as trace:
+            result = self._answer(question, n_results, web_search)
+            trace.attributes.update(source=result["source"], cached=result["cached"])
+        return dict(result, trace_id=trace.trace_id, timings=trace.timings())
+
+    def _answer(self, question: str, n_results: int, web_search: bool) -> Dict[str, Any]:
+        docs, ids, web_results, _ = self._gather_context(question, n_results, web_search)
+        cached, query_embedding, fingerprint = self._lookup_cached(question, docs, ids, web_search)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        raw_answer, error = "", None
+        try:
+            if docs:
+                context = "\n\n".join(docs)
+                source = "documents"
+                raw_answer = call_groq_deepseek(question, context)
+            elif web_results is not None:
+                from app.utils.gemini_summarizer import gemini_summarize_web_results
+                context = web_results
+                source = "web"
+                raw_answer = gemini_summarize_web_results(question, context)
+            else:
+                context = ""
+                source = "llm"
+                raw_answer = call_groq_deepseek(question, "")
+        except ProviderError as e:
+            error = f"[{e.label}] {e}"
+        result = {
+            "answer": error or filter_think_tags(raw_answer),
+            "raw_answer": raw_answer,
+            "context": context,
+            "source": source,
+            "cached": False,
+            "error": error,
+        }
+        self._store_answer(query_embedding, fingerprint, result)
+        return result
+
+    def answer_stream(self, question: str, n_results: int = 5,
+                      web_search: bool = False) -> Tuple[Dict[str, Any], Iterator[str]]:
+        """
+        Streaming variant of answer(): retrieval runs up front, then the completion is streamed
+        with <think>...</think> spans removed as they arrive.
+        Args:
+            question: The user's question
+            n_results: Number of chunks retrieved as context
+            web_search: Search the web and summarize with Gemini when no chunks are found
+        Returns:
+            Tuple[Dict[str, Any], Iterator[str]]: The result dict (``context``, ``source``, ``cached``,
+            ``trace_id``; ``answer``, ``raw_answer``, ``error`` and ``timings`` are filled in once the
+            stream is exhausted) and the iterator of visible text pieces. A failed completion ends
+            the stream with the error message and is not cached.
+        """
+        trace = start_trace("question", n_results=n_results, web_search=web_search, stream=True)
+        with activate(trace):
+            docs, ids, web_results, _ = self._gather_context(question, n_results, web_search)
+            cached, query_embedding, fingerprint = self._lookup_cached(question, docs, ids, web_search)
+        if cached is not None:
+            trace.attributes.update(source=cached["source"], cached=True)
+            finish_trace(trace)
+            result = dict(cached, cached=True, trace_id=trace.trace_id, timings=trace.timings())
+            return result, iter([result["answer"]])
+
+        if docs:
+            context = "\n\n".join(docs)
+            pieces = stream_groq_deepseek(question, context)
+            source = "documents"
+        elif web_results is not None:
+            from app.utils.gemini_summarizer import stream_gemini_summary
+            context = web_results
+            pieces = stream_gemini_summary(question, context)
+            source = "web"
+        else:
+            context = ""
+            pieces = stream_groq_deepseek(question, "")
+            source = "llm"
+        result = {"answer": "", "raw_answer": "", "context": context, "source": source, "cached": False,
+                  "error": None, "trace_id": trace.trace_id}
+        trace.attributes.update(source=source, cached=False)
+
+        def generate():
+            raw = []
+
+            def record(stream):
+                for piece in stream:
+                    raw.append(piece)
+                    yield piece
+
+            visible = []
+            stream = filter_think_tags_stream(record(pieces))
+            try:
+                while True:
+                    # The stream may be consumed on other threads; attach the trace per step
+                    with activate(trace):
+                        text = next(stream, None)
+                    if text is None:
+                        break
+                    visible.append(text)
+                    yield text
+            except ProviderError as e:
+                result["error"] = f"[{e.label}] {e}"
+                notice = f"\n\n{result['error']}" if visible else result["error"]
+                visible.append(notice)
+                yield notice
+            finally:
+                finish_trace(trace)
+                result["timings"] = trace.timings()
+            result["raw_answer"] = "".join(raw)
+            result["answer"] = "".join(visible)
+            self._store_answer(query_embedding, fingerprint, dict(result))
+
+        return result, generate()
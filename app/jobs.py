@@ -0,0 +1,473 @@
+import io
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from app.engine import VECTOR_DB_PATH
+from app.retrieval.manifest import QuotaExceededError, file_content_hash
+from app.utils.metrics import count
+
+# Lives in the vector database directory; snapshots leave it out
+QUEUE_FILE = "ingest_jobs.sqlite"
+# Worker threads per process; each one indexes a batch of files of one tenant at a time
+INGEST_WORKERS = int(os.getenv("LUMINARAG_INGEST_WORKERS", "1"))
+# Files claimed together and parsed side by side on the process pool
+INGEST_BATCH_FILES = int(os.getenv("LUMINARAG_INGEST_BATCH_FILES", str(os.cpu_count() or 4)))
+# Seconds a running job stays claimed without a heartbeat before any worker may requeue it
+INGEST_LEASE_SECONDS = float(os.getenv("LUMINARAG_INGEST_LEASE_SECONDS", "300"))
+
+QUEUED, RUNNING, DONE, SKIPPED, FAILED = "queued", "running", "done", "skipped", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+_COLUMNS = ("id", "tenant", "file_name", "file_hash", "status", "stage", "chunks_indexed", "chunks_total",
+            "attempts", "error", "created", "started", "finished")
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _remove_spooled(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _job(row) -> Dict[str, Any]:
+    job = dict(zip(_COLUMNS, row))
+    if job["status"] in (DONE, SKIPPED):
+        job["progress"] = 1.0
+    elif job["chunks_total"]:
+        job["progress"] = job["chunks_indexed"] / job["chunks_total"]
+    else:
+        job["progress"] = 0.0
+    return job
+
+
+class IngestQueue:
+    """
+    Persistent queue of files waiting to be indexed, shared by every process using the same file.
+
+    Uploads are copied to a spool directory when they are enqueued, so a job survives a browser
+    refresh or a restart of the process that accepted it. Jobs are claimed in batches of one
+    tenant at a time: while a tenant has a running job no other worker claims its files. Workers
+    in several processes (Streamlit, API workers, the CLI) may share one queue; RAGEngine holds the
+    manifest's file lock while it ingests or removes files, so their updates are not lost. A claim
+    is a lease that the worker renews with heartbeats; jobs whose lease expired (a worker died on
+    any host) or whose worker process on this host is gone are queued again by requeue_stale().
+    Re-running them is safe because chunk ids are deterministic.
+    """
+
+    def __init__(self, path: Optional[str] = None, spool_directory: Optional[str] = None,
+                 max_attempts: int = 3, lease_seconds: float = INGEST_LEASE_SECONDS):
+        """
+        Args:
+            path: SQLite file holding the jobs (defaults to ingest_jobs.sqlite in the vector database directory)
+            spool_directory: Directory for the copies of queued uploads (defaults to ``<path>_spool``)
+            max_attempts: Number of claims after which a job that keeps crashing its worker fails
+            lease_seconds: Seconds without a heartbeat after which a running job is considered abandoned
+        """
+        path = path or os.path.join(VECTOR_DB_PATH, QUEUE_FILE)
+        self.path = path
+        self.spool_directory = spool_directory or f"{os.path.splitext(path)[0]}_spool"
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        os.makedirs(self.spool_directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode; claims open their own write transaction
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, tenant TEXT NOT NULL, file_name TEXT NOT NULL, "
+            "file_hash TEXT NOT NULL, path TEXT NOT NULL, status TEXT NOT NULL, stage TEXT, "
+            "chunks_indexed INTEGER NOT NULL DEFAULT 0, chunks_total INTEGER, attempts INTEGER NOT NULL DEFAULT 0, "
+            "owner TEXT, error TEXT, created REAL NOT NULL, started REAL, finished REAL, heartbeat REAL)"
+        )
+        # Queues created before leases existed
+        if "heartbeat" not in {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+            try:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat REAL")
+            except sqlite3.OperationalError:
+                pass  # Added by another process in the meantime
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_tenant ON jobs(tenant, id)")
+
+    def enqueue(self, file, tenant: str = "", file_name: Optional[str] = None) -> int:
+        """
+        Spool a file and queue it for indexing. A file already queued or running with the same
+        name and content is not queued twice.
+        Args:
+            file: File-like object (Streamlit upload, FastAPI upload file, local file)
+            tenant: Tenant whose collection receives the file ("" for the default collection)
+            file_name: Name to index the file under (defaults to ``file.name``)
+        Returns:
+            int: Id of the job
+        """
+        file_name = file_name or file.name
+        file_hash = file_content_hash(file)
+        query = "SELECT id FROM jobs WHERE tenant = ? AND file_name = ? AND file_hash = ? AND status IN (?, ?)"
+        params = (tenant, file_name, file_hash, *ACTIVE)
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        if row:
+            return row[0]
+        path = os.path.join(self.spool_directory, f"{uuid.uuid4().hex}.pdf")
+        file.seek(0)
+        with open(path, "wb") as spooled:
+            shutil.copyfileobj(file, spooled, 1 << 20)
+        # Check again and insert in one write transaction, so two processes enqueuing the same
+        # upload at once end up with one job
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(query, params).fetchone()
+                if row is None:
+                    cursor = self._conn.execute(
+                        "INSERT INTO jobs (tenant, file_name, file_hash, path, status, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (tenant, file_name, file_hash, path, QUEUED, time.time()),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                _remove_spooled(path)
+                raise
+        if row:
+            _remove_spooled(path)
+            return row[0]
+        count("ingest_jobs", status=QUEUED)
+        return cursor.lastrowid
+
+    def claim(self, owner: str, limit: int = 1) -> List[Dict[str, Any]]:
+        """
+        Atomically take up to limit queued jobs of the oldest tenant nobody is indexing for.
+        Only one job per file name is taken, so a batch never holds two versions of a file.
+        Returns:
+            List[Dict[str, Any]]: The claimed jobs, now running (empty if there is nothing to do)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tenant FROM jobs WHERE status = ? AND tenant NOT IN "
+                    "(SELECT tenant FROM jobs WHERE status = ?) ORDER BY id LIMIT 1",
+                    (QUEUED, RUNNING),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return []
+                ids, names = [], set()
+                for job_id, file_name in self._conn.execute(
+                        "SELECT id, file_name FROM jobs WHERE status = ? AND tenant = ? ORDER BY id", (QUEUED, row[0])):
+                    if file_name not in names:
+                        ids.append(job_id)
+                        names.add(file_name)
+                        if len(ids) == limit:
+                            break
+                placeholders = ",".join("?" * len(ids))
+                now = time.time()
+                self._conn.execute(
+                    f"UPDATE jobs SET status = ?, stage = 'parsing', owner = ?, started = ?, heartbeat = ?, "
+                    f"attempts = attempts + 1 WHERE id IN ({placeholders})",
+                    (RUNNING, owner, now, now, *ids),
+                )
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)}, path FROM jobs WHERE id IN ({placeholders}) ORDER BY id", ids
+                ).fetchall()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [dict(_job(row[:-1]), path=row[-1]) for row in rows]
+
+    def progress(self, job_id: int, stage: str, chunks_indexed: int = 0, chunks_total: Optional[int] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, chunks_indexed = ?, chunks_total = COALESCE(?, chunks_total), "
+                "heartbeat = ? WHERE id = ? AND status = ?",
+                (stage, chunks_indexed, chunks_total, time.time(), job_id, RUNNING),
+            )
+
+    def heartbeat(self, job_ids: List[int]):
+        """
+        Renew the lease of running jobs.
+        """
+        if not job_ids:
+            return
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET heartbeat = ? WHERE id IN ({','.join('?' * len(job_ids))}) AND status = ?",
+                (time.time(), *job_ids, RUNNING),
+            )
+
+    def finish(self, job_id: int, status: str, error: Optional[str] = None):
+        """
+        Mark a job done, skipped (already indexed unchanged) or failed, and drop its spooled copy.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = NULL, error = ?, finished = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+        if row:
+            _remove_spooled(row[0])
+        count("ingest_jobs", status=status)
+
+    def requeue_stale(self) -> int:
+        """
+        Queue again the running jobs whose lease expired, whichever host claimed them, and those
+        whose worker process on this host no longer exists; jobs that already used max_attempts
+        claims fail instead.
+        Returns:
+            int: Number of jobs requeued or failed
+        """
+        host = socket.gethostname()
+        now = time.time()
+        expired = now - self.lease_seconds
+        failed = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, owner, attempts, path, COALESCE(heartbeat, started) FROM jobs WHERE status = ?",
+                    (RUNNING,),
+                ).fetchall()
+                stale = []
+                for job_id, owner, attempts, path, heartbeat in rows:
+                    owner_host, _, pid = (owner or "").rpartition(":")
+                    dead = owner_host == host and pid.isdigit() and not _pid_alive(int(pid))
+                    if dead or (heartbeat or 0) < expired:
+                        stale.append((job_id, attempts, path))
+                for job_id, attempts, path in stale:
+                    if attempts >= self.max_attempts:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, stage = NULL, error = ?, finished = ? WHERE id = ?",
+                            (FAILED, f"Worker stopped while indexing the file {attempts} times", now, job_id),
+                        )
+                        failed.append(path)
+                    else:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, stage = NULL, owner = NULL, heartbeat = NULL, "
+                            "chunks_indexed = 0 WHERE id = ?",
+                            (QUEUED, job_id),
+                        )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        for path in failed:
+            _remove_spooled(path)
+            count("ingest_jobs", status=FAILED)
+        return len(stale)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def jobs(self, tenant: Optional[str] = None, status: Optional[str] = None, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        The most recent jobs, oldest first, optionally of one tenant or status.
+        """
+        clauses, params = [], []
+        if tenant is not None:
+            clauses.append("tenant = ?")
+            params.append(tenant)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs {where} ORDER BY id DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [_job(row) for row in reversed(rows)]
+
+    def summary(self, tenant: Optional[str] = None) -> Dict[str, int]:
+        """
+        Number of jobs per status.
+        """
+        query, params = "SELECT status, COUNT(*) FROM jobs", ()
+        if tenant is not None:
+            query, params = query + " WHERE tenant = ?", (tenant,)
+        with self._lock:
+            counts = dict(self._conn.execute(query + " GROUP BY status", params).fetchall())
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, SKIPPED, FAILED)}
+
+    def purge_finished(self, older_than: float = 7 * 86400) -> int:
+        """
+        Forget finished jobs older than older_than seconds.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND finished < ?", (*ACTIVE, time.time() - older_than)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class IngestWorker:
+    """
+    Background threads draining an IngestQueue into the tenants' engines.
+
+    Each claim takes a batch of one tenant's files and runs them through RAGEngine.ingest:
+    the PDFs are parsed and chunked on a process pool, while embedding and index writes stay
+    in this process, which owns the engine. A file becomes searchable (and its job done) as
+    soon as its own chunks are indexed, while the rest of the batch is still being processed.
+    """
+
+    def __init__(self, queue: IngestQueue, resolve_engine: Callable[[str], Any], threads: int = INGEST_WORKERS,
+                 batch_files: int = INGEST_BATCH_FILES, poll_interval: float = 1.0):
+        """
+        Args:
+            queue: IngestQueue to drain
+            resolve_engine: Callable returning the RAGEngine of a tenant ("" for the default collection)
+            threads: Number of worker threads
+            batch_files: Maximum number of files claimed at once
+            poll_interval: Seconds between polls of an empty queue
+        """
+        self.queue = queue
+        self.resolve_engine = resolve_engine
+        self.threads = threads
+        self.batch_files = batch_files
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "IngestWorker":
+        """
+        Requeue the jobs of crashed workers, then start the worker threads.
+        """
+        self.queue.requeue_stale()
+        self.queue.purge_finished()
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop claiming jobs and wait for the current batches to finish.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self) -> int:
+        """
+        Claim and process one batch in the calling thread.
+        Returns:
+            int: Number of jobs processed (0 when nothing was queued)
+        """
+        jobs = self.queue.claim(_owner(), limit=self.batch_files)
+        if jobs:
+            done = threading.Event()
+            renewer = threading.Thread(target=self._renew_leases, args=([job["id"] for job in jobs], done),
+                                       name="ingest-lease", daemon=True)
+            renewer.start()
+            try:
+                self._process(jobs)
+            finally:
+                done.set()
+                renewer.join()
+        return len(jobs)
+
+    def run_until_empty(self) -> int:
+        """
+        Process batches until the queue has nothing left to claim.
+        Returns:
+            int: Number of jobs processed
+        """
+        self.queue.requeue_stale()
+        processed = 0
+        while True:
+            done = self.run_once()
+            if not done:
+                return processed
+            processed += done
+
+    def _renew_leases(self, job_ids: List[int], done: threading.Event):
+        while not done.wait(self.queue.lease_seconds / 3):
+            try:
+                self.queue.heartbeat(job_ids)
+            except Exception as e:
+                print(f"Ingest worker heartbeat error: {str(e)}")
+
+    def _run(self):
+        # start() has just requeued; look again for expired leases every half lease
+        next_requeue = time.monotonic() + self.queue.lease_seconds / 2
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_requeue:
+                    self.queue.requeue_stale()
+                    next_requeue = time.monotonic() + self.queue.lease_seconds / 2
+                if self.run_once():
+                    continue
+            except Exception as e:
+                print(f"Ingest worker error: {str(e)}")
+            self._stop.wait(self.poll_interval)
+
+    def _process(self, jobs: List[Dict[str, Any]]):
+        pending = {job["file_name"]: job for job in jobs}
+        try:
+            engine = self.resolve_engine(jobs[0]["tenant"])
+        except Exception as e:
+            for job in jobs:
+                self.queue.finish(job["id"], FAILED, f"Could not open the collection: {str(e)}")
+            return
+
+        files = []
+        for name, job in list(pending.items()):
+            try:
+                file = io.FileIO(job["path"], "rb")
+            except OSError as e:
+                self.queue.finish(job["id"], FAILED, f"Spooled upload is missing: {str(e)}")
+                del pending[name]
+                continue
+            file.name = name
+            files.append(file)
+
+        def on_progress(name, indexed, total):
+            self.queue.progress(pending[name]["id"], "indexing", indexed, total)
+
+        def on_indexed(name):
+            self.queue.finish(pending.pop(name)["id"], DONE)
+
+        error = None
+        try:
+            engine.ingest(files, prune=False, on_indexed=on_indexed, on_progress=on_progress)
+        except QuotaExceededError as e:
+            error = str(e)
+        except Exception as e:
+            error = f"Indexing error: {str(e)}"
+        finally:
+            for file in files:
+                file.close()
+        for name, job in pending.items():
+            if error is None and engine.manifest.is_current(name, job["file_hash"], engine.chunking):
+                self.queue.finish(job["id"], SKIPPED)
+            else:
+                self.queue.finish(job["id"], FAILED, error or "No text could be extracted or indexing failed")
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.utils.metrics import record
+
+# Dedicated pool: asyncio.run() waits for its default executor on exit, which would
+# make the caller wait for a cancelled web search to finish
+STAGE_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="luminarag-stage")
+
+
+async def _timed_stage(fn: Callable[[], Any], timeout: float, timings: Dict[str, float], name: str):
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        # Carry the current trace into the worker thread
+        context = contextvars.copy_context()
+        return await asyncio.wait_for(loop.run_in_executor(STAGE_EXECUTOR, context.run, fn), timeout)
+    finally:
+        timings[f"{name}_ms"] = (time.perf_counter() - start) * 1000
+        record(name, timings[f"{name}_ms"])
+
+
+async def speculative_context(retrieve_fn: Optional[Callable[[], Any]], web_fn: Optional[Callable[[], Any]] = None,
+                              retrieval_timeout: float = 10.0, web_timeout: float = 15.0,
+                              accept: Callable[[Any], bool] = bool) -> Dict[str, Any]:
+    """
+    Run document retrieval and web search concurrently and keep whichever context is usable.
+
+    Retrieval wins whenever it returns an accepted result within its deadline; the
+    web search is then cancelled. Otherwise the web result is awaited until its own
+    deadline. Blocking calls run in worker threads, so a cancelled stage stops being
+    awaited but its thread finishes in the background (bounded by the HTTP timeouts).
+    Args:
+        retrieve_fn: Blocking callable returning retrieval results, or None to skip retrieval
+        web_fn: Blocking callable returning web search results, or None when web search is off
+        retrieval_timeout: Deadline for retrieval in seconds
+        web_timeout: Deadline for the web search in seconds, counted from the start
+        accept: Predicate deciding whether a retrieval result is usable context
+    Returns:
+        Dict[str, Any]: ``retrieval`` (result or None), ``web_results`` (str or None),
+        ``source`` ("documents", "web" or None) and ``timings`` in milliseconds
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    web_task = asyncio.create_task(_timed_stage(web_fn, web_timeout, timings, "web_search")) if web_fn else None
+    retrieval = None
+    try:
+        if retrieve_fn is not None:
+            try:
+                retrieval = await _timed_stage(retrieve_fn, retrieval_timeout, timings, "retrieval")
+            except asyncio.TimeoutError:
+                print(f"Retrieval timed out after {retrieval_timeout}s")
+            except Exception as e:
+                if web_task is None:
+                    raise
+                print(f"Retrieval error, using web results: {str(e)}")
+            if retrieval is not None and accept(retrieval):
+                return {"retrieval": retrieval, "web_results": None, "source": "documents", "timings": timings}
+
+        web_results = None
+        if web_task is not None:
+            try:
+                web_results = await web_task
+            except asyncio.TimeoutError:
+                print(f"Web search timed out after {web_timeout}s")
+            except Exception as e:
+                print(f"Web search error: {str(e)}")
+        return {
+            "retrieval": retrieval,
+            "web_results": web_results,
+            "source": "web" if web_results else None,
+            "timings": timings,
+        }
+    finally:
+        if web_task is not None and not web_task.done():
+            web_task.cancel()
+        timings["context_ms"] = (time.perf_counter() - start) * 1000
+
+
+def gather_context(retrieve_fn, web_fn=None, retrieval_timeout: float = 10.0, web_timeout: float = 15.0,
+                   accept: Callable[[Any], bool] = bool) -> Dict[str, Any]:
+    """
+    Blocking wrapper around speculative_context for synchronous callers.
+    """
+    return asyncio.run(speculative_context(
+        retrieve_fn, web_fn, retrieval_timeout=retrieval_timeout, web_timeout=web_timeout, accept=accept
+    ))
@@ -0,0 +1,293 @@
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+try:
+    import fcntl
+except ImportError:  # Windows: only one process may write to an index at a time
+    fcntl = None
+
+
+# Keeps identifiers such as "AB-1234", "3.2.1" or "clause_7" together as one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-case tokenizer that emits compound identifiers and their parts.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-_./]", token) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Sparse lexical index over chunk ids, scored with Okapi BM25.
+
+    On disk the index is a gzip-compressed JSON snapshot of per-chunk term
+    frequencies plus an append-only log of additions and removals, so writes
+    never require loading the index. The index is loaded (snapshot + log
+    replay) on first search and the log is folded into the snapshot by compact().
+
+    Several processes may share the files: writes and compaction hold an
+    exclusive lock on ``<path>.lock``, and every search first replays the log
+    lines written since the last one (or reloads after another process compacted).
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            path: Path prefix of the index files (``.json.gz`` snapshot and ``.log``)
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.snapshot_path = f"{path}.json.gz"
+        self.log_path = f"{path}.log"
+        self.lock_path = f"{path}.lock"
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._loaded = False
+        self._docs: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        # What the in-memory index reflects: the snapshot's stamp and the log up to _log_offset
+        self._snapshot_stamp = None
+        self._log_inode = None
+        self._log_offset = 0
+
+    # --- in-memory maintenance ---
+    def _add_doc(self, doc_id: str, term_freqs: Dict[str, int]):
+        if doc_id in self._docs:
+            self._remove_doc(doc_id)
+        self._docs[doc_id] = term_freqs
+        length = sum(term_freqs.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+        for term, freq in term_freqs.items():
+            self._postings.setdefault(term, {})[doc_id] = freq
+
+    def _remove_doc(self, doc_id: str):
+        term_freqs = self._docs.pop(doc_id, None)
+        if term_freqs is None:
+            return
+        self._total_length -= self._lengths.pop(doc_id, 0)
+        for term in term_freqs:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _apply(self, entry: Dict):
+        if entry["op"] == "add":
+            for doc_id, term_freqs in entry["docs"].items():
+                self._add_doc(doc_id, term_freqs)
+        elif entry["op"] == "remove":
+            for doc_id in entry["ids"]:
+                self._remove_doc(doc_id)
+        elif entry["op"] == "clear":
+            self._reset()
+
+    def _reset(self):
+        self._docs, self._lengths, self._postings = {}, {}, {}
+        self._total_length = 0
+
+    # --- persistence ---
+    @staticmethod
+    def _stat(path: str):
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the index's lock, shared by every thread and process using these files.
+        Re-entrant within a process.
+        """
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            directory = os.path.dirname(self.lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_snapshot(self):
+        self._reset()
+        stat = self._stat(self.snapshot_path)
+        if stat is not None:
+            with gzip.open(self.snapshot_path, "rt", encoding="utf-8") as f:
+                for doc_id, term_freqs in json.load(f)["docs"].items():
+                    self._add_doc(doc_id, term_freqs)
+        self._snapshot_stamp = stat and (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        self._log_inode = None
+        self._log_offset = 0
+
+    def _replay_log(self):
+        # Apply the complete log lines written since the last replay, by any process
+        stat = self._stat(self.log_path)
+        if stat is None or stat.st_size <= self._log_offset:
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        self._log_inode = stat.st_ino
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                # A line still being written (or torn by an interrupted write)
+                break
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            self._apply(entry)
+            self._log_offset += len(line)
+
+    def _is_current(self) -> bool:
+        snapshot = self._stat(self.snapshot_path)
+        if (snapshot and (snapshot.st_mtime_ns, snapshot.st_size, snapshot.st_ino)) != self._snapshot_stamp:
+            return False
+        log = self._stat(self.log_path)
+        # A log that was removed or replaced means another process compacted the index
+        if log is None:
+            return self._log_offset == 0
+        return self._log_inode in (None, log.st_ino) and log.st_size >= self._log_offset
+
+    def _sync(self):
+        """
+        Bring the in-memory index up to date with the files; call with the lock held.
+        """
+        if not self._loaded or not self._is_current():
+            self._load_snapshot()
+            self._loaded = True
+        self._replay_log()
+
+    def _ensure_loaded(self):
+        with self.locked():
+            self._sync()
+
+    def _append_log(self, entry: Dict):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.locked():
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            if self._loaded:
+                self._sync()
+
+    def _snapshot_bytes(self) -> int:
+        stat = self._stat(self.snapshot_path)
+        return stat.st_size if stat else 0
+
+    def compact(self):
+        """
+        Fold the append-only log into a fresh snapshot.
+        """
+        with self.locked():
+            # Include every line other processes appended before the lock was taken
+            self._sync()
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({"docs": self._docs}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.snapshot_path)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            stat = self._stat(self.snapshot_path)
+            self._snapshot_stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            self._log_inode = None
+            self._log_offset = 0
+
+    # --- public API ---
+    def add(self, ids: List[str], texts: List[str]):
+        """
+        Index (or re-index) chunks by id.
+        """
+        docs = {doc_id: dict(Counter(tokenize(text))) for doc_id, text in zip(ids, texts)}
+        self._append_log({"op": "add", "docs": docs})
+
+    def remove(self, ids: Iterable[str]):
+        ids = list(ids)
+        if not ids:
+            return
+        self._append_log({"op": "remove", "ids": ids})
+
+    def clear(self):
+        with self.locked():
+            self._append_log({"op": "clear"})
+            self.compact()
+
+    def exists(self) -> bool:
+        """
+        Whether the index has been written at all (it may be empty).
+        """
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.log_path)
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._docs)
+
+    def search(self, query: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """
+        Return the ids and BM25 scores of the best matching chunks.
+        """
+        self._ensure_loaded()
+        # Scoring only needs this process's copy, not the cross-process lock
+        with self._lock:
+            total_docs = len(self._docs)
+            if not total_docs:
+                return []
+            avg_length = self._total_length / total_docs or 1.0
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, freq in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+            # Fold the log into the snapshot once it outgrows it, while the index is loaded anyway
+            if self._log_offset > max(1 << 20, self._snapshot_bytes()):
+                self.compact()
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse several ranked id lists with reciprocal rank fusion.
+    Returns:
+        List[Tuple[str, float]]: ids with fused scores, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
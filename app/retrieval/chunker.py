@@ -0,0 +1,176 @@
+import re
+from functools import lru_cache
+from itertools import accumulate
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# A token (word, number or single punctuation mark, close to what a BPE tokenizer emits for
+# English text) together with the whitespace that follows it
+TOKEN_PATTERN = re.compile(r"\w+\s*|[^\w\s]\s*")
+# The same token read backwards, for scanning a reversed copy of the text
+REVERSED_TOKEN = r"\s*(?:\w+|[^\w\s])"
+LEADING_SPACE = re.compile(r"\s*")
+SENTENCE_END = frozenset(".!?")
+# Last character of a token that ends a sentence or a paragraph
+CUT_POINT = re.compile(r"[.!?]|\S(?=\s*?\n\n)")
+
+
+class TokenChunker:
+    """
+    Token-budgeted splitter that records where each chunk sits in its page.
+
+    Chunk boundaries are found with bounded regex repetitions over the page (and a reversed
+    copy of it for looking back), so only offsets are handled in Python and the page text is
+    sliced once per chunk. Every token is still matched by the regex engine, which makes this
+    about half as fast as LangChain's character splitter on the same pages; it is chosen for
+    token budgets and citation offsets, not speed. A chunk ends at the last sentence or
+    paragraph end inside its final ``boundary_window`` tokens when there is one. Every chunk
+    keeps the page's metadata plus ``start_index`` / ``end_index`` (character offsets in the
+    page, for citations) and ``token_count``.
+    """
+
+    name = "token"
+
+    def __init__(self, chunk_tokens: int = 256, overlap_tokens: int = 32, boundary_window: int = 48,
+                 encoding: str = None):
+        """
+        Args:
+            chunk_tokens: Maximum number of tokens per chunk
+            overlap_tokens: Number of tokens repeated at the start of the next chunk
+            boundary_window: Number of trailing tokens searched for a sentence or paragraph end
+            encoding: Optional tiktoken encoding name (e.g. "cl100k_base") for exact model
+                token counts; the default regex tokenizer needs no extra dependency
+        """
+        if chunk_tokens <= 0 or not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("Need chunk_tokens > 0 and 0 <= overlap_tokens < chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.boundary_window = min(boundary_window, chunk_tokens - 1)
+        self._encoding = None
+        if encoding:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding)
+        # A chunk is matched as its head and the boundary window (the last boundary_window + 1
+        # tokens, each with its trailing whitespace). Greedy repetitions with nothing after them
+        # never backtrack into a word.
+        window = self.boundary_window + 1
+        self._head_pattern = re.compile(rf"(?:\w+\s*|[^\w\s]\s*){{0,{chunk_tokens - window}}}")
+        self._window_pattern = re.compile(rf"(?:\w+\s*|[^\w\s]\s*){{0,{window}}}")
+        self._overlap_pattern = re.compile(rf"(?:{REVERSED_TOKEN}){{0,{overlap_tokens}}}")
+
+    def tokenize(self, text: str) -> Tuple[int, List[str]]:
+        """
+        Split text into tokens, each followed by its trailing whitespace.
+        Returns:
+            Tuple[int, List[str]]: Offset of the first token and the pieces, which cover the
+            rest of the text contiguously
+        """
+        if self._encoding is None:
+            return LEADING_SPACE.match(text).end(), TOKEN_PATTERN.findall(text)
+        _, offsets = self._encoding.decode_with_offsets(self._encoding.encode(text, disallowed_special=()))
+        bounds = offsets + [len(text)]
+        # BPE tokens carry their leading space; move it to the previous piece and drop whitespace-only tokens
+        starts = []
+        for start, end in zip(bounds, bounds[1:]):
+            stripped = text[start:end].lstrip()
+            if stripped:
+                starts.append(end - len(stripped))
+        starts.append(len(text))
+        return starts[0], [text[a:b] for a, b in zip(starts, starts[1:])]
+
+    def split_text_spans(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield (start offset, end offset, token count) of the chunks of one text.
+        """
+        if self._encoding is not None:
+            return self._split_token_pieces(text)
+        return self._split_regex(text)
+
+    def _split_regex(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        length = len(text)
+        reversed_text = text[::-1]
+        start = LEADING_SPACE.match(text).end()
+        while start < length:
+            window = self._head_pattern.match(text, start).end()
+            stop = self._window_pattern.match(text, window).end()
+            if stop == length:
+                end = length - LEADING_SPACE.match(reversed_text).end()
+                yield start, end, len(TOKEN_PATTERN.findall(text, start))
+                return
+            count = self.chunk_tokens
+            # Back off to the last sentence or paragraph end inside the boundary window
+            cut = None
+            for cut in CUT_POINT.finditer(text, window, stop):
+                pass
+            if cut is None:
+                end = length - LEADING_SPACE.match(reversed_text, length - stop).end()
+            else:
+                end = cut.end()
+                count -= len(TOKEN_PATTERN.findall(text, end, stop))
+            yield start, end, count
+            following = length - self._overlap_pattern.match(reversed_text, length - end).end()
+            if following <= start:
+                following = TOKEN_PATTERN.match(text, start).end()
+            start = LEADING_SPACE.match(text, following).end()
+
+    def _split_token_pieces(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        offset, pieces = self.tokenize(text)
+        count = len(pieces)
+        starts = list(accumulate(map(len, pieces), initial=offset))
+        first = 0
+        while first < count:
+            end = min(first + self.chunk_tokens, count)
+            if end < count:
+                # Back off to the last sentence or paragraph end inside the boundary window
+                for k in range(end, max(first + 1, end - self.boundary_window) - 1, -1):
+                    token = pieces[k - 1].rstrip()
+                    if token[-1] in SENTENCE_END or "\n\n" in pieces[k - 1]:
+                        end = k
+                        break
+            yield starts[first], starts[end - 1] + len(pieces[end - 1].rstrip()), end - first
+            if end == count:
+                return
+            first = max(end - self.overlap_tokens, first + 1)
+
+    def iter_documents(self, documents: Iterable["Document"]) -> Iterator["Document"]:
+        """
+        Lazily split documents (typically one per PDF page) into chunk Documents.
+        """
+        from langchain_core.documents import Document
+        for document in documents:
+            text = document.page_content
+            for start, end, tokens in self.split_text_spans(text):
+                metadata = dict(document.metadata)
+                metadata.update(start_index=start, end_index=end, token_count=tokens)
+                yield Document(page_content=text[start:end], metadata=metadata)
+
+    def split_documents(self, documents: Iterable["Document"]) -> List["Document"]:
+        return list(self.iter_documents(documents))
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end, _ in self.split_text_spans(text)]
+
+
+# Default (chunk_size, chunk_overlap) per chunker: characters for "recursive", tokens for "token"
+DEFAULT_CHUNKING = {
+    "recursive": (1000, 200),
+    "token": (256, 32),
+}
+
+
+@lru_cache(maxsize=16)
+def get_splitter(chunker: str = "recursive", chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Return a shared splitter exposing split_documents():
+    "recursive" (LangChain RecursiveCharacterTextSplitter, sizes in characters) or
+    "token" / "token:<tiktoken encoding>" (TokenChunker, sizes in tokens).
+    """
+    kind, _, option = chunker.partition(":")
+    if kind == "recursive":
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if kind == "token":
+        return TokenChunker(chunk_tokens=chunk_size, overlap_tokens=chunk_overlap, encoding=option or None)
+    raise ValueError(f"Unknown chunker: {chunker}")
@@ -0,0 +1,119 @@
+import math
+from typing import Any, Dict, List, Optional
+
+
+def distance_to_similarity(distance: float, space: str = "l2") -> float:
+    """
+    Convert a Chroma distance into a cosine-style similarity (1.0 = identical).
+    The l2 conversion assumes unit-length embeddings, which holds for the Google
+    and hashing embedders used here.
+    Args:
+        distance: Distance returned by Chroma
+        space: The collection's ``hnsw:space`` ("l2", "cosine" or "ip")
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (about four characters per token for English text).
+    """
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+def filter_by_similarity(hits: List[Dict[str, Any]], threshold: Optional[float]) -> List[Dict[str, Any]]:
+    """
+    Drop hits whose similarity is known and below the threshold.
+    """
+    if threshold is None:
+        return hits
+    return [hit for hit in hits if hit.get("similarity") is None or hit["similarity"] >= threshold]
+
+
+def _overlap_length(first: str, second: str, max_overlap: int) -> int:
+    # Longest suffix of first that is also a prefix of second
+    for length in range(min(len(first), len(second), max_overlap), 0, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+
+def merge_overlapping_chunks(hits: List[Dict[str, Any]], min_overlap: int = 30,
+                             max_overlap: int = 400) -> List[Dict[str, Any]]:
+    """
+    Collapse retrieved chunks that repeat each other because of the splitter's chunk overlap.
+    Exact duplicates and chunks contained in another hit are dropped; neighbouring chunks of
+    the same file that share a boundary are joined into one hit, kept at the better rank.
+    Args:
+        hits: Ranked hits with ``document`` and ``metadata`` keys
+        min_overlap: Minimum shared boundary, in characters, for two chunks to be joined
+        max_overlap: Maximum boundary length searched
+    Returns:
+        List[Dict[str, Any]]: Hits with overlapping text merged, in rank order
+    """
+    merged: List[Dict[str, Any]] = []
+    for hit in hits:
+        text = hit["document"]
+        file_name = (hit.get("metadata") or {}).get("file_name")
+        absorbed = False
+        for kept in merged:
+            if text in kept["document"]:
+                absorbed = True
+            elif kept["document"] in text:
+                kept["document"] = text
+                absorbed = True
+            elif file_name is not None and (kept.get("metadata") or {}).get("file_name") == file_name:
+                overlap = _overlap_length(kept["document"], text, max_overlap)
+                if overlap >= min_overlap:
+                    kept["document"] = kept["document"] + text[overlap:]
+                    absorbed = True
+                else:
+                    overlap = _overlap_length(text, kept["document"], max_overlap)
+                    if overlap >= min_overlap:
+                        kept["document"] = text + kept["document"][overlap:]
+                        absorbed = True
+            if absorbed:
+                kept.setdefault("merged_ids", [kept.get("id")]).append(hit.get("id"))
+                break
+        if not absorbed:
+            merged.append(dict(hit))
+    return merged
+
+
+def pack_context(hits: List[Dict[str, Any]], max_tokens: Optional[int], count_tokens=estimate_tokens,
+                 separator: str = "\n\n") -> List[Dict[str, Any]]:
+    """
+    Select hits in rank order until the token budget is used up.
+    Hits that do not fit are skipped so that smaller, lower-ranked ones can still fill
+    the budget; the top hit is truncated if it alone exceeds the budget.
+    Args:
+        hits: Ranked hits with a ``document`` key
+        max_tokens: Token budget for the joined context (None for no limit)
+        count_tokens: Callable estimating the token count of a text
+        separator: Text placed between hits
+    Returns:
+        List[Dict[str, Any]]: The hits that fit, in rank order
+    """
+    if max_tokens is None:
+        return hits
+    packed, used = [], 0
+    separator_tokens = count_tokens(separator)
+    for hit in hits:
+        cost = count_tokens(hit["document"]) + (separator_tokens if packed else 0)
+        if used + cost <= max_tokens:
+            packed.append(hit)
+            used += cost
+        elif not packed:
+            # Keep a truncated top hit rather than sending no context at all
+            ratio = max_tokens / max(cost, 1)
+            packed.append(dict(hit, document=hit["document"][:int(len(hit["document"]) * ratio)]))
+            used = max_tokens
+    return packed
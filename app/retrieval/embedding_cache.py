@@ -0,0 +1,196 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from app.utils.metrics import cache_lookup
+
+
+class CachedEmbeddings:
+    """
+    On-disk embedding cache wrapped around a LangChain-style embedder.
+
+    Vectors are stored as float32 blobs in SQLite keyed by a hash of the model
+    name, the embedding kind (document or query) and the text. Least recently
+    used entries are evicted once the entry or byte limits are exceeded; the totals
+    are kept in a one-row table, so checking the limits does not scan the cache.
+    """
+
+    def __init__(self, embedder, path: str, model_name: Optional[str] = None,
+                 max_entries: int = 500_000, max_bytes: int = 2 << 30):
+        """
+        Args:
+            embedder: Object exposing embed_documents(texts) and embed_query(text)
+            path: SQLite file used to persist the cache
+            model_name: Name recorded in the cache key (defaults to the embedder's model_name)
+            max_entries: Maximum number of cached vectors
+            max_bytes: Maximum total size of cached vectors in bytes
+        """
+        self.embedder = embedder
+        self.model_name = (model_name or getattr(embedder, "model_name", None) or getattr(embedder, "model", None)
+                           or type(embedder).__name__)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._create_stats()
+        self._conn.commit()
+
+    def _create_stats(self):
+        # Running entry and byte totals, kept exact by triggers so that every connection to the
+        # file (including other processes) updates them and eviction never has to scan the table
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_stats ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO cache_stats (id, entries, bytes) "
+            "SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings BEGIN "
+            "UPDATE cache_stats SET entries = entries + 1, bytes = bytes + LENGTH(NEW.vector) WHERE id = 0; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings BEGIN "
+            "UPDATE cache_stats SET entries = entries - 1, bytes = bytes - LENGTH(OLD.vector) WHERE id = 0; END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS embeddings_update AFTER UPDATE OF vector ON embeddings BEGIN "
+            "UPDATE cache_stats SET bytes = bytes - LENGTH(OLD.vector) + LENGTH(NEW.vector) WHERE id = 0; END"
+        )
+
+    def _totals(self):
+        return self._conn.execute("SELECT entries, bytes FROM cache_stats WHERE id = 0").fetchone()
+
+    @property
+    def dimension(self) -> int:
+        return getattr(self.embedder, "dimension", 0)
+
+    @property
+    def spec(self) -> str:
+        return getattr(self.embedder, "spec", "")
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_name}|{kind}|".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        now = time.time()
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: the implicit delete of REPLACE does not fire triggers
+            self._conn.executemany(
+                "INSERT INTO embeddings (key, vector, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET vector = excluded.vector, last_used = excluded.last_used",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count, size = self._totals()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        excess = count - self.max_entries
+        if size > self.max_bytes and count:
+            excess = max(excess, int(count * (size - self.max_bytes) / size) + 1)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+
+    def _embed(self, kind: str, texts: List[str], embed_fn) -> List[List[float]]:
+        keys = [self._key(kind, text) for text in texts]
+        found = self._lookup(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        miss_count = sum(1 for key in keys if key not in found)
+        self.hits += len(keys) - miss_count
+        self.misses += miss_count
+        cache_lookup("embedding", hits=len(keys) - miss_count, misses=miss_count)
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed document texts, computing only the ones not already cached.
+        """
+        return self._embed("document", list(texts), self.embedder.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query text, reusing a cached vector when available.
+        """
+        return self._embed("query", [text], lambda texts: [self.embedder.embed_query(texts[0])])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several query texts, computing the uncached ones in one batch when the embedder supports it.
+        """
+        if hasattr(self.embedder, "embed_queries"):
+            embed_fn = self.embedder.embed_queries
+        else:
+            embed_fn = lambda batch: [self.embedder.embed_query(text) for text in batch]
+        return self._embed("query", list(texts), embed_fn)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            entries, size = self._totals()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,98 @@
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Tuple
+
+from app.utils.metrics import count, stage
+
+
+RATE_LIMIT_MARKERS = ("429", "rate limit", "ratelimit", "resource exhausted", "resourceexhausted", "quota")
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Heuristically detect rate-limit / quota errors raised by embedding providers.
+    """
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+class EmbeddingScheduler:
+    """
+    Splits texts into batches and embeds them on a bounded thread pool,
+    retrying rate-limited batches with jittered exponential backoff.
+    """
+
+    def __init__(self, embedder, batch_size: int = 64, max_workers: int = 4,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0):
+        """
+        Args:
+            embedder: Object exposing embed_documents(texts)
+            batch_size: Number of texts per embedding request
+            max_workers: Maximum number of concurrent embedding requests
+            max_retries: Retries per batch before giving up
+            base_delay: Initial backoff delay in seconds
+            max_delay: Upper bound for a single backoff delay in seconds
+        """
+        self.embedder = embedder
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                with stage("embed"):
+                    vectors = self.embedder.embed_documents(texts)
+                count("embedded_texts", len(texts))
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries or not is_rate_limit_error(e):
+                    raise
+                count("embedding_retries")
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                time.sleep(random.uniform(0, delay))
+                attempt += 1
+
+    def iter_batches(self, texts: List[str]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        Embed texts batch by batch, yielding results as soon as each batch completes.
+        Args:
+            texts: Texts to embed
+        Returns:
+            Iterator[Tuple[int, List[List[float]]]]: (start offset, vectors) per batch, in completion order
+        """
+        starts = iter(range(0, len(texts), self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            in_flight = {}
+
+            def submit_next():
+                start = next(starts, None)
+                if start is not None:
+                    batch = texts[start:start + self.batch_size]
+                    in_flight[pool.submit(self._embed_batch, batch)] = start
+
+            # Keep at most 2x the pool size queued so memory stays bounded on huge inputs
+            for _ in range(self.max_workers * 2):
+                submit_next()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start = in_flight.pop(future)
+                    yield start, future.result()
+                    submit_next()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed all texts and return the vectors in input order.
+        """
+        vectors: List[List[float]] = [None] * len(texts)
+        for start, batch in self.iter_batches(texts):
+            vectors[start:start + len(batch)] = batch
+        return vectors
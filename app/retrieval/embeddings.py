@@ -0,0 +1,183 @@
+import hashlib
+import math
+import random
+import re
+import time
+from typing import List
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class EmbeddingProvider:
+    """
+    Interface of the embedders used by VectorStore.
+
+    Providers expose ``model_name`` and ``dimension`` (recorded in and validated
+    against the collection metadata), ``spec`` (the build_embeddings spec that
+    recreates them) and embed documents and queries separately, since some
+    models use different task types for each.
+    """
+
+    model_name: str = ""
+    dimension: int = 0
+
+    @property
+    def spec(self) -> str:
+        return ""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+class GoogleEmbeddings(EmbeddingProvider):
+    """
+    Google Generative AI embeddings, with batched query embedding.
+    """
+
+    KNOWN_DIMENSIONS = {"models/embedding-001": 768, "models/text-embedding-004": 768}
+
+    def __init__(self, model_name: str = "models/embedding-001"):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        self.model_name = model_name
+        self.client = GoogleGenerativeAIEmbeddings(model=model_name)
+        self._dimension = self.KNOWN_DIMENSIONS.get(model_name)
+
+    @property
+    def spec(self) -> str:
+        return f"google:{self.model_name}"
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = len(self.client.embed_query("dimension probe"))
+        return self._dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed_documents(texts, task_type="retrieval_query")
+
+
+class LocalEmbeddings(EmbeddingProvider):
+    """
+    CPU-local sentence-transformers embedder with batched, vectorized inference.
+    Needs no network access or API key once the model is downloaded.
+    """
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", batch_size: int = 64,
+                 device: str = "cpu"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("LocalEmbeddings requires `pip install sentence-transformers`") from e
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    @property
+    def spec(self) -> str:
+        return f"local:{self.model_name}"
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return vectors.astype("float32").tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+
+class RateLimitSimulated(Exception):
+    """
+    Raised by HashingEmbeddings to mimic a provider's HTTP 429 response.
+    """
+
+    status_code = 429
+
+
+class HashingEmbeddings(EmbeddingProvider):
+    """
+    Deterministic, dependency-free stand-in embedder based on feature hashing.
+
+    Useful for offline load tests of the ingestion pipeline: it can simulate
+    per-request latency and a rate of rate-limit failures.
+    """
+
+    def __init__(self, dimension: int = 384, latency: float = 0.0, rate_limit_probability: float = 0.0,
+                 seed: int = 0):
+        """
+        Args:
+            dimension: Size of the produced vectors
+            latency: Seconds slept per embed_documents / embed_query call
+            rate_limit_probability: Probability that a call raises RateLimitSimulated
+            seed: Seed for the failure simulation
+        """
+        self.model_name = f"hashing-{dimension}"
+        self.dimension = dimension
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self._random = random.Random(seed)
+
+    @property
+    def spec(self) -> str:
+        return f"hashing:{self.dimension}"
+
+    def _simulate_request(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_probability and self._random.random() < self.rate_limit_probability:
+            raise RateLimitSimulated("429 rate limit exceeded (simulated)")
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._simulate_request()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._simulate_request()
+        return self._vector(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        self._simulate_request()
+        return [self._vector(text) for text in texts]
+
+
+def build_embeddings(spec: str) -> EmbeddingProvider:
+    """
+    Build an embedding provider from a spec: "google[:<model>]", "local[:<model>]" or "hashing[:<dimension>]".
+    """
+    kind, _, option = spec.partition(":")
+    if kind == "google":
+        return GoogleEmbeddings(option) if option else GoogleEmbeddings()
+    if kind == "local":
+        return LocalEmbeddings(option) if option else LocalEmbeddings()
+    if kind == "hashing":
+        return HashingEmbeddings(int(option)) if option else HashingEmbeddings()
+    raise ValueError(f"Unknown embedding provider: {spec}")
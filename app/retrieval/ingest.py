@@ -1,23 +1,54 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+import os
+import shutil
 import tempfile
+import time
+from app.retrieval.chunker import get_splitter
+from app.utils.metrics import count, record, stage
 
 
-def process_pdf(uploaded_file):
+def spool_to_temp_file(uploaded_file):
+    """
+    Copies an uploaded file to a named temporary PDF file in fixed-size blocks.
+    Args:
+        uploaded_file: A file-like object (Streamlit uploader)
+    Returns:
+        str: Path of the temporary file; the caller is responsible for removing it
+    """
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        shutil.copyfileobj(uploaded_file, tmp_file, 1 << 20)
+        return tmp_file.name
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def process_pdf(uploaded_file, chunk_size=1000, chunk_overlap=200, chunker="recursive"):
     """
     Extracts and splits text from an uploaded PDF file and returns chunked documents with metadata.
     Args:
         uploaded_file: A file-like object (Streamlit uploader)
+        chunk_size: Size of each chunk
+        chunk_overlap: Overlap between chunks
+        chunker: Splitter name (see get_splitter)
     Returns:
         List[Document]: List of chunked Document objects with metadata
     """
+    # langchain_community pulls in langsmith and friends; only pay for it when a PDF is parsed
+    from langchain_community.document_loaders import PyPDFLoader
+    tmp_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(uploaded_file.read())
-            loader = PyPDFLoader(tmp_file.name)
-            documents = loader.load()
+        tmp_path = spool_to_temp_file(uploaded_file)
+        with stage("pdf_parse"):
+            documents = PyPDFLoader(tmp_path).load()
+        count("pages_parsed", len(documents))
 
         for doc in documents:
             doc.metadata.update({
@@ -26,21 +57,244 @@ def process_pdf(uploaded_file):
                 "timestamp": datetime.now().isoformat()
             })
 
-        return split_texts(documents)
+        with stage("chunk"):
+            chunks = split_texts(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunker=chunker)
+        count("chunks_created", len(chunks))
+        return chunks
     except Exception as e:
         print(f"PDF processing error: {str(e)}")
         return []
+    finally:
+        if tmp_path:
+            _remove_quietly(tmp_path)
+
+
+def _count_pages(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _page_document(reader, page_number, file_name, timestamp):
+    from langchain_core.documents import Document
+    return Document(
+        page_content=reader.pages[page_number].extract_text() or "",
+        metadata={
+            "source": file_name,
+            "page": page_number,
+            "source_type": "pdf",
+            "file_name": file_name,
+            "timestamp": timestamp
+        }
+    )
+
 
-def split_texts(documents, chunk_size=1000, chunk_overlap=200):
+def _parse_page_range(path, file_name, start_page, end_page, chunk_size, chunk_overlap, chunker="recursive"):
+    """
+    Worker task: extracts pages [start_page, end_page) of a PDF and splits them into chunks.
+    Returns:
+        Tuple[List[Document], int, float, float]: Chunks, page count, and parse and chunking
+        times in milliseconds (workers cannot record metrics for the parent process)
+    """
+    from pypdf import PdfReader
+    start = time.perf_counter()
+    reader = PdfReader(path)
+    timestamp = datetime.now().isoformat()
+    documents = []
+    for page_number in range(start_page, min(end_page, len(reader.pages))):
+        documents.append(_page_document(reader, page_number, file_name, timestamp))
+    parsed = time.perf_counter()
+    chunks = split_texts(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunker=chunker)
+    return chunks, len(documents), (parsed - start) * 1000, (time.perf_counter() - parsed) * 1000
+
+
+def _record_parse(parts):
+    # Per-file totals over the page-range tasks
+    record("pdf_parse", sum(part[2] for part in parts))
+    record("chunk", sum(part[3] for part in parts))
+    count("pages_parsed", sum(part[1] for part in parts))
+    count("chunks_created", sum(len(part[0]) for part in parts))
+
+
+def process_pdfs_parallel(uploaded_files, chunk_size=1000, chunk_overlap=200, max_workers=None, pages_per_task=50,
+                          chunker="recursive"):
+    """
+    Parses and chunks many PDF files on a process pool, splitting large files into page ranges.
+    Yields each file's chunks, in page order, as soon as all of its page ranges are done.
+    Temporary copies of the uploads are removed once parsing finishes.
+    Args:
+        uploaded_files: File-like objects with a ``name`` attribute
+        chunk_size: Size of each chunk
+        chunk_overlap: Overlap between chunks
+        max_workers: Number of worker processes (defaults to the CPU count)
+        pages_per_task: Maximum number of pages parsed by a single task
+        chunker: Splitter name (see get_splitter)
+    Returns:
+        Iterator[Tuple[object, List[Document]]]: (uploaded file, chunked Documents) per file
+    """
+    tmp_paths = []
+    tasks = []
+    try:
+        for file in uploaded_files:
+            try:
+                path = spool_to_temp_file(file)
+                tmp_paths.append(path)
+                page_count = _count_pages(path)
+            except Exception as e:
+                print(f"PDF processing error ({file.name}): {str(e)}")
+                continue
+            ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+            tasks.append((file, path, ranges))
+
+        total_tasks = sum(len(ranges) for _, _, ranges in tasks)
+        if total_tasks == 0:
+            return
+        if total_tasks == 1 or max_workers == 1:
+            # Not worth the process start-up cost
+            for file, path, ranges in tasks:
+                try:
+                    parts = [_parse_page_range(path, file.name, start, end, chunk_size, chunk_overlap, chunker)
+                             for start, end in ranges]
+                except Exception as e:
+                    print(f"PDF processing error ({file.name}): {str(e)}")
+                    continue
+                _record_parse(parts)
+                yield file, [doc for part in parts for doc in part[0]]
+            return
+
+        workers = min(max_workers or os.cpu_count() or 1, total_tasks)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            pending = {}
+            for file, path, ranges in tasks:
+                pending[id(file)] = {"file": file, "remaining": len(ranges), "parts": {}, "failed": False}
+                for start, end in ranges:
+                    future = pool.submit(_parse_page_range, path, file.name, start, end, chunk_size, chunk_overlap,
+                                         chunker)
+                    futures[future] = (id(file), start)
+
+            for future in as_completed(futures):
+                key, start = futures[future]
+                state = pending[key]
+                try:
+                    state["parts"][start] = future.result()
+                except Exception as e:
+                    print(f"PDF processing error ({state['file'].name}, page {start}): {str(e)}")
+                    state["failed"] = True
+                state["remaining"] -= 1
+                if state["remaining"] == 0 and not state["failed"]:
+                    parts = [state["parts"][part_start] for part_start in sorted(state["parts"])]
+                    _record_parse(parts)
+                    yield state["file"], [doc for part in parts for doc in part[0]]
+    finally:
+        for path in tmp_paths:
+            _remove_quietly(path)
+
+
+def iter_pdf_pages(path, file_name):
+    """
+    Lazily yields one Document per PDF page without materializing the whole file.
+    Args:
+        path: Path of the PDF on disk
+        file_name: Name recorded in the chunk metadata
+    Returns:
+        Iterator[Document]: One Document per page
+    """
+    from pypdf import PdfReader
+    timestamp = datetime.now().isoformat()
+    with open(path, "rb") as stream:
+        reader = PdfReader(stream)
+        for page_number in range(len(reader.pages)):
+            yield _page_document(reader, page_number, file_name, timestamp)
+
+
+def iter_pdf_chunks(uploaded_file, chunk_size=1000, chunk_overlap=200, chunker="recursive"):
+    """
+    Streams an uploaded PDF page by page, yielding chunks as each page is split.
+    The upload is copied to disk in blocks and the temporary copy is removed when the generator finishes.
+    Args:
+        uploaded_file: A file-like object (Streamlit uploader)
+        chunk_size: Size of each chunk
+        chunk_overlap: Overlap between chunks
+        chunker: Splitter name (see get_splitter)
+    Returns:
+        Iterator[Document]: Chunked Document objects
+    """
+    tmp_path = spool_to_temp_file(uploaded_file)
+    parse_ms = chunk_ms = 0.0
+    pages = chunks = 0
+    try:
+        text_splitter = get_splitter(chunker, chunk_size, chunk_overlap)
+        page_iter = iter_pdf_pages(tmp_path, uploaded_file.name)
+        while True:
+            start = time.perf_counter()
+            page = next(page_iter, None)
+            parsed = time.perf_counter()
+            parse_ms += (parsed - start) * 1000
+            if page is None:
+                break
+            pages += 1
+            page_chunks = [chunk for chunk in text_splitter.split_documents([page]) if chunk.page_content.strip()]
+            chunk_ms += (time.perf_counter() - parsed) * 1000
+            chunks += len(page_chunks)
+            yield from page_chunks
+    finally:
+        _remove_quietly(tmp_path)
+        # Per-file totals, excluding the time the consumer spends between chunks
+        record("pdf_parse", parse_ms)
+        record("chunk", chunk_ms)
+        count("pages_parsed", pages)
+        count("chunks_created", chunks)
+
+
+def process_pdfs_streaming(uploaded_files, chunk_size=1000, chunk_overlap=200, chunker="recursive"):
+    """
+    Bounded-memory counterpart of process_pdfs_parallel: yields each file with a lazy chunk iterator.
+    Args:
+        uploaded_files: File-like objects with a ``name`` attribute
+        chunk_size: Size of each chunk
+        chunk_overlap: Overlap between chunks
+        chunker: Splitter name (see get_splitter)
+    Returns:
+        Iterator[Tuple[object, Iterator[Document]]]: (uploaded file, chunk iterator) per file
+    """
+    for file in uploaded_files:
+        yield file, iter_pdf_chunks(file, chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunker=chunker)
+
+
+def iter_chunk_batches(chunks, max_batch_bytes=4 << 20, max_batch_size=256):
+    """
+    Groups a stream of chunks into batches bounded by total text size and count.
+    This is the memory ceiling for chunks held between parsing and indexing.
+    Args:
+        chunks: Iterable of Document objects
+        max_batch_bytes: Maximum UTF-8 size of the texts in one batch
+        max_batch_size: Maximum number of chunks in one batch
+    Returns:
+        Iterator[List[Document]]: Batches of chunks
+    """
+    batch, batch_bytes = [], 0
+    for chunk in chunks:
+        size = len(chunk.page_content.encode("utf-8"))
+        if batch and (batch_bytes + size > max_batch_bytes or len(batch) >= max_batch_size):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(chunk)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def split_texts(documents, chunk_size=1000, chunk_overlap=200, chunker="recursive"):
     """
     Splits documents into manageable text chunks.
     Args:
         documents: List of Document objects
-        chunk_size: Size of each chunk
+        chunk_size: Size of each chunk (characters for "recursive", tokens for "token")
         chunk_overlap: Overlap between chunks
+        chunker: Splitter name (see get_splitter)
     Returns:
         List[Document]: Chunked Document objects
     """
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    split_docs = text_splitter.split_documents(documents)
-    return [Document(page_content=chunk.page_content, metadata=chunk.metadata) for chunk in split_docs if chunk.page_content.strip()] 
\ No newline at end of file
+    # The splitter already returns fresh Documents; only drop the blank ones
+    split_docs = get_splitter(chunker, chunk_size, chunk_overlap).split_documents(documents)
+    return [chunk for chunk in split_docs if chunk.page_content.strip()]
\ No newline at end of file
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one process may ingest into a collection at a time
+    fcntl = None
+from app.retrieval.ingest import iter_chunk_batches
+
+
+def file_content_hash(file_obj, block_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hex digest of a file-like object without changing its position.
+    Args:
+        file_obj: A seekable binary file-like object (e.g. Streamlit uploader)
+        block_size: Number of bytes read per step
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    position = file_obj.tell()
+    file_obj.seek(0)
+    for block in iter(lambda: file_obj.read(block_size), b""):
+        digest.update(block)
+    file_obj.seek(position)
+    return digest.hexdigest()
+
+
+def chunking_key(chunk_size: int, chunk_overlap: int, chunker: str = "recursive") -> str:
+    """
+    Build the string identifying the chunking parameters a file was indexed with.
+    """
+    if chunker == "recursive":
+        # Format of manifests written before the chunker was selectable
+        return f"{chunk_size}:{chunk_overlap}"
+    return f"{chunker}:{chunk_size}:{chunk_overlap}"
+
+
+def make_chunk_id(file_name: str, file_hash: str, chunking: str, index: int, text: str) -> str:
+    """
+    Derive a deterministic chunk id from the file name and hash, chunking parameters, chunk position and text.
+    The name keeps byte-identical files uploaded under different names from sharing chunks.
+    """
+    digest = hashlib.sha256(f"{file_name}|{file_hash}|{chunking}|{index}|".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class IngestManifest:
+    """
+    Persistent record of which files are indexed, with the content hash and
+    chunking parameters they were indexed with and the ids of their chunks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self._stamp = None
+        self.reload()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def reload(self):
+        """
+        Re-read the manifest from disk, picking up files indexed or removed by other processes.
+        """
+        self._stamp = self._file_stamp()
+        if self._stamp is None:
+            self.files = {}
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+        except (OSError, ValueError) as e:
+            print(f"Ingest manifest load error: {str(e)}")
+            self.files = {}
+
+    def refresh(self):
+        """
+        Reload the manifest if the file changed on disk since it was last read or written.
+        """
+        if self._file_stamp() != self._stamp:
+            self.reload()
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold an exclusive lock shared by every process (and engine) using this manifest and load
+        its current contents, so read-modify-save cycles of concurrent writers do not overwrite
+        each other.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.reload()
+                yield self
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def is_current(self, file_name: str, file_hash: str, chunking: str) -> bool:
+        """
+        Return True if the file is already indexed with the same content and chunking.
+        """
+        entry = self.files.get(file_name)
+        return bool(entry) and entry["hash"] == file_hash and entry["chunking"] == chunking
+
+    def chunk_ids(self, file_name: str) -> List[str]:
+        entry = self.files.get(file_name)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def file_names(self) -> List[str]:
+        return list(self.files)
+
+    def record(self, file_name: str, file_hash: str, chunking: str, chunk_ids: List[str]):
+        self.files[file_name] = {"hash": file_hash, "chunking": chunking, "chunk_ids": list(chunk_ids)}
+
+    def remove(self, file_name: str) -> List[str]:
+        """
+        Forget a file and return the chunk ids it owned.
+        """
+        entry = self.files.pop(file_name, None)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def save(self):
+        """
+        Atomically write the manifest to disk.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp_path, self.path)
+        self._stamp = self._file_stamp()
+
+
+class QuotaExceededError(Exception):
+    """
+    Raised when indexing would exceed a tenant's file or chunk quota.
+    """
+
+
+def sync_uploaded_files(vector_store, manifest: IngestManifest, uploaded_files, process_files_fn,
+                        chunk_size: int = 1000, chunk_overlap: int = 200, on_indexed=None,
+                        max_batch_bytes: int = 4 << 20, prune: bool = True, max_files: Optional[int] = None,
+                        max_chunks: Optional[int] = None, chunker: str = "recursive", on_progress=None):
+    """
+    Bring the vector store in line with the uploaded files: skip unchanged files,
+    delete chunks of removed or changed files, and index new or changed files.
+    Args:
+        vector_store: VectorStore to update
+        manifest: IngestManifest tracking the indexed files
+        uploaded_files: File-like objects with a ``name`` attribute
+        process_files_fn: Callable(files, chunk_size=..., chunk_overlap=..., chunker=...) yielding
+            (file, chunked Documents) pairs, e.g. ``process_pdfs_parallel``; the chunks
+            may be a lazy iterator, as with ``process_pdfs_streaming``
+        chunk_size: Size of each chunk
+        chunk_overlap: Overlap between chunks
+        chunker: Splitter name passed to process_files_fn (see get_splitter)
+        on_indexed: Optional callback invoked with the name of each newly indexed file
+        max_batch_bytes: Maximum size of chunk text held in memory before it is indexed
+        prune: Treat uploaded_files as the whole corpus and remove files not among them
+        max_files: Maximum number of indexed files (None for no limit)
+        max_chunks: Maximum number of chunks in the vector store (None for no limit)
+        on_progress: Optional callback invoked after each indexed batch with the file name, the
+            number of its chunks indexed so far and its total chunk count (None for lazy chunks)
+    Returns:
+        Tuple[List[str], List[str]]: Names of files indexed and names of files removed
+    """
+    chunking = chunking_key(chunk_size, chunk_overlap, chunker)
+    current = {f.name: f for f in uploaded_files}
+    removed = [name for name in manifest.file_names() if name not in current] if prune else []
+    indexed = []
+    pending_hashes: Dict[str, str] = {}
+    for name, file in current.items():
+        file_hash = file_content_hash(file)
+        if not manifest.is_current(name, file_hash, chunking):
+            pending_hashes[name] = file_hash
+
+    # Check the quota before anything is deleted, so a rejected sync leaves the index as it was
+    kept = len(set(manifest.file_names()) - set(removed) - set(pending_hashes))
+    if pending_hashes and max_files is not None and kept + len(pending_hashes) > max_files:
+        raise QuotaExceededError(
+            f"File quota exceeded: {kept} indexed + {len(pending_hashes)} new > {max_files}"
+        )
+
+    stale_ids: List[str] = []
+    for name in removed + list(pending_hashes):
+        stale_ids.extend(manifest.remove(name))
+    if stale_ids:
+        vector_store.delete(ids=stale_ids)
+    manifest.save()
+    if not pending_hashes:
+        return indexed, removed
+
+    total_chunks = vector_store.collection.count() if max_chunks is not None else 0
+    pending_files = [current[name] for name in pending_hashes]
+    for file, docs in process_files_fn(pending_files, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                       chunker=chunker):
+        file_hash = pending_hashes[file.name]
+        total = len(docs) if hasattr(docs, "__len__") else None
+        ids: List[str] = []
+        batch_ids: List[str] = []
+        try:
+            for batch in iter_chunk_batches(docs, max_batch_bytes=max_batch_bytes):
+                batch_ids = []
+                if max_chunks is not None and total_chunks + len(batch) > max_chunks:
+                    raise QuotaExceededError(f"Chunk quota of {max_chunks} exceeded while indexing {file.name}")
+                batch_ids = [make_chunk_id(file.name, file_hash, chunking, len(ids) + i, doc.page_content)
+                             for i, doc in enumerate(batch)]
+                vector_store.add_documents(
+                    docs=[doc.page_content for doc in batch],
+                    metadatas=[doc.metadata for doc in batch],
+                    ids=batch_ids,
+                )
+                ids.extend(batch_ids)
+                total_chunks += len(batch_ids)
+                batch_ids = []
+                if on_progress:
+                    on_progress(file.name, len(ids), total)
+        except QuotaExceededError:
+            vector_store.delete(ids=ids)
+            raise
+        except Exception as e:
+            print(f"Indexing error ({file.name}): {str(e)}")
+            # A failed add_documents call may already have written some of its sub-batches
+            vector_store.delete(ids=ids + batch_ids)
+            continue
+        if not ids:
+            continue
+        manifest.record(file.name, file_hash, chunking, ids)
+        manifest.save()
+        indexed.append(file.name)
+        if on_indexed:
+            on_indexed(file.name)
+
+    return indexed, removed
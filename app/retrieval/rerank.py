@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from app.retrieval.bm25 import tokenize
+from app.utils.metrics import cache_lookup, record
+
+
+class LexicalOverlapScorer:
+    """
+    Dependency-free stand-in for a cross-encoder: scores a passage by how many of
+    the query's terms and adjacent term pairs it contains.
+    """
+
+    name = "lexical-overlap"
+
+    def score_batch(self, query: str, texts: List[str]) -> List[float]:
+        query_tokens = tokenize(query)
+        query_terms = set(query_tokens)
+        query_pairs = set(zip(query_tokens, query_tokens[1:]))
+        if not query_terms:
+            return [0.0] * len(texts)
+        scores = []
+        for text in texts:
+            tokens = tokenize(text)
+            terms = set(tokens)
+            score = len(query_terms & terms) / len(query_terms)
+            if query_pairs:
+                score += 0.5 * len(query_pairs & set(zip(tokens, tokens[1:]))) / len(query_pairs)
+            scores.append(score)
+        return scores
+
+
+class CrossEncoderScorer:
+    """
+    Small local cross-encoder (sentence-transformers) run on CPU in batches.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = "cpu"):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("CrossEncoderScorer requires `pip install sentence-transformers`") from e
+        self.name = model_name
+        self.model = CrossEncoder(model_name, device=device)
+
+    def score_batch(self, query: str, texts: List[str]) -> List[float]:
+        return [float(score) for score in self.model.predict([(query, text) for text in texts])]
+
+
+def build_scorer(name: str):
+    """
+    Build a scorer by name: "lexical" or "cross-encoder" (optionally "cross-encoder:<model>").
+    """
+    if name == "lexical":
+        return LexicalOverlapScorer()
+    if name.startswith("cross-encoder"):
+        _, _, model_name = name.partition(":")
+        return CrossEncoderScorer(model_name) if model_name else CrossEncoderScorer()
+    raise ValueError(f"Unknown reranker: {name}")
+
+
+class Reranker:
+    """
+    Rescores over-fetched retrieval hits with a pluggable scorer, in batches,
+    caching (query, chunk) scores in an LRU.
+    """
+
+    def __init__(self, scorer=None, batch_size: int = 16, cache_size: int = 10000):
+        """
+        Args:
+            scorer: Object with ``name`` and ``score_batch(query, texts)`` (defaults to LexicalOverlapScorer)
+            batch_size: Number of (query, chunk) pairs scored per call
+            cache_size: Maximum number of cached scores
+        """
+        self.scorer = scorer or LexicalOverlapScorer()
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.last_timings: Dict[str, float] = {}
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, query: str, hit: Dict[str, Any]) -> str:
+        digest = hashlib.sha256(f"{self.scorer.name}|{query}|".encode("utf-8"))
+        # Chunk ids are content-derived; fall back to the text for hits without one
+        digest.update((hit.get("id") or hit["document"]).encode("utf-8"))
+        return digest.hexdigest()
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Return the top_k hits by scorer score, each with a ``rerank_score`` key.
+        Timings and cache statistics of the call are stored in ``last_timings``.
+        """
+        start = time.perf_counter()
+        keys = [self._key(query, hit) for hit in hits]
+        scores: Dict[str, float] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[key] = self._cache[key]
+        cached = len(scores)
+        todo = [(key, hit) for key, hit in zip(keys, hits) if key not in scores]
+        for offset in range(0, len(todo), self.batch_size):
+            batch = todo[offset:offset + self.batch_size]
+            batch_scores = self.scorer.score_batch(query, [hit["document"] for _, hit in batch])
+            for (key, _), score in zip(batch, batch_scores):
+                scores[key] = score
+        with self._lock:
+            for key, _ in todo:
+                self._cache[key] = scores[key]
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        ranked = sorted(
+            (dict(hit, rerank_score=scores[key]) for key, hit in zip(keys, hits)),
+            key=lambda hit: hit["rerank_score"],
+            reverse=True,
+        )
+        self.last_timings = {
+            "rerank_ms": (time.perf_counter() - start) * 1000,
+            "candidates": len(hits),
+            "scored": len(todo),
+            "cached": cached,
+        }
+        record("rerank", self.last_timings["rerank_ms"])
+        cache_lookup("rerank", hits=cached, misses=len(todo))
+        return ranked[:top_k]
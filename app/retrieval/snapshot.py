@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import sqlite3
+import time
+from typing import Any, Dict, Iterable
+
+SNAPSHOT_INFO = "snapshot.json"
+# Rebuilt on demand and usually much larger than the index itself (the embedding cache), or
+# state of work in progress rather than of the index (the ingestion job queue and its spooled uploads)
+DEFAULT_EXCLUDE = ("embedding_cache.sqlite", "ingest_jobs")
+
+
+def _is_sqlite(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(16) == b"SQLite format 3\x00"
+
+
+def _copy_sqlite(source: str, destination: str):
+    # The backup API yields a consistent copy even while other connections are open
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(destination)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def create_snapshot(persist_directory: str, destination: str, exclude: Iterable[str] = DEFAULT_EXCLUDE,
+                    info: Dict[str, Any] = None) -> str:
+    """
+    Copy a vector database directory (Chroma files, manifests and BM25 indexes) to destination.
+    The copy is assembled next to destination and renamed into place, so destination either
+    holds a complete snapshot or does not exist. SQLite files are copied with the backup API;
+    their -wal / -shm files are folded into the copy.
+    Args:
+        persist_directory: Directory of the persistent Chroma database
+        destination: Snapshot directory to create (must not exist)
+        exclude: File and directory name prefixes left out of the snapshot
+        info: Extra fields recorded in the snapshot's snapshot.json
+    Returns:
+        str: The snapshot directory
+    """
+    if os.path.exists(destination):
+        raise FileExistsError(f"Snapshot destination already exists: {destination}")
+    partial = f"{destination}.partial-{os.getpid()}"
+    shutil.rmtree(partial, ignore_errors=True)
+    exclude = tuple(exclude)
+    try:
+        for root, directories, files in os.walk(persist_directory):
+            directories[:] = [name for name in directories if not name.startswith(exclude)]
+            relative = os.path.relpath(root, persist_directory)
+            target_root = os.path.normpath(os.path.join(partial, relative))
+            os.makedirs(target_root, exist_ok=True)
+            for name in files:
+                if name.startswith(exclude) or name.endswith(("-wal", "-shm", "-journal")) or name == SNAPSHOT_INFO:
+                    continue
+                source = os.path.join(root, name)
+                target = os.path.join(target_root, name)
+                if _is_sqlite(source):
+                    _copy_sqlite(source, target)
+                else:
+                    shutil.copy2(source, target)
+        with open(os.path.join(partial, SNAPSHOT_INFO), "w", encoding="utf-8") as f:
+            json.dump(dict(info or {}, created=time.time(), source=os.path.abspath(persist_directory)), f)
+        os.replace(partial, destination)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return destination
+
+
+def restore_snapshot(snapshot: str, persist_directory: str) -> str:
+    """
+    Replace a vector database directory with a snapshot taken by create_snapshot.
+    The snapshot is copied next to persist_directory first and swapped in with renames; the
+    previous directory is kept as ``<persist_directory>.previous`` until the swap succeeded.
+    No process may have the database open while it is restored.
+    Returns:
+        str: The restored directory
+    """
+    if not os.path.exists(os.path.join(snapshot, SNAPSHOT_INFO)):
+        raise ValueError(f"Not a snapshot directory: {snapshot}")
+    persist_directory = os.path.normpath(persist_directory)
+    staged = f"{persist_directory}.restoring"
+    previous = f"{persist_directory}.previous"
+    shutil.rmtree(staged, ignore_errors=True)
+    shutil.copytree(snapshot, staged)
+    os.remove(os.path.join(staged, SNAPSHOT_INFO))
+    if os.path.exists(persist_directory):
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(persist_directory, previous)
+        # Keep the caches that were left out of the snapshot
+        for name in os.listdir(previous):
+            if name.startswith(DEFAULT_EXCLUDE) and not os.path.exists(os.path.join(staged, name)):
+                os.replace(os.path.join(previous, name), os.path.join(staged, name))
+    os.replace(staged, persist_directory)
+    shutil.rmtree(previous, ignore_errors=True)
+    # Chroma caches one system per path in this process; drop it so the restored files are read
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+    return persist_directory
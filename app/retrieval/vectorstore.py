@@ -1,29 +1,529 @@
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
 import chromadb
+from chromadb.api.types import EmbeddingFunction
 from chromadb.config import Settings
-from typing import List, Dict, Any
+from chromadb.errors import NotFoundError
+from chromadb.utils.embedding_functions import register_embedding_function
+from typing import List, Dict, Any, Optional
+from app.retrieval.bm25 import BM25Index, reciprocal_rank_fusion
+from app.retrieval.context import cosine_similarity, distance_to_similarity
+from app.retrieval.embedding_scheduler import EmbeddingScheduler
+from app.retrieval.snapshot import create_snapshot
+from app.utils.metrics import count, record, stage
+
+_SEGMENT_DIRECTORY = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+class EmbeddingMismatchError(ValueError):
+    """
+    Raised when a collection was built with a different embedding model or dimension.
+    """
+
+
+def embedding_model_name(embedding_function) -> Optional[str]:
+    return getattr(embedding_function, "model_name", None) or getattr(embedding_function, "model", None)
+
+
+@register_embedding_function
+class ChromaEmbeddingAdapter(EmbeddingFunction):
+    """
+    Exposes a LangChain-style embedder to Chroma, so that any text Chroma embeds itself
+    (e.g. ``query_texts``) uses the same model as the precomputed embeddings.
+
+    Chroma persists get_config() with the collection and rebuilds the adapter from it
+    whenever a collection is opened; the embedder is only built from its spec (see
+    build_embeddings) when Chroma actually has to embed something.
+    """
+
+    def __init__(self, embedder=None, spec: Optional[str] = None, model_name: Optional[str] = None):
+        """
+        Args:
+            embedder: The embedder to expose; built lazily from spec when omitted
+            spec: build_embeddings spec of the embedder (e.g. "google:models/embedding-001")
+            model_name: Model name recorded with the collection
+        """
+        self._embedder = embedder
+        self.spec = spec or getattr(embedder, "spec", None)
+        self.model_name = model_name or embedding_model_name(embedder)
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            if not self.spec:
+                raise ValueError(f"Embedder {self.model_name!r} cannot be rebuilt; open the collection "
+                                 "through VectorStore with its embedder")
+            from app.retrieval.embeddings import build_embeddings
+            self._embedder = build_embeddings(self.spec)
+        return self._embedder
+
+    def __call__(self, input):
+        return self.embedder.embed_documents(list(input))
+
+    def embed_query(self, input):
+        if hasattr(self.embedder, "embed_queries"):
+            return self.embedder.embed_queries(list(input))
+        return [self.embedder.embed_query(text) for text in input]
+
+    @staticmethod
+    def name() -> str:
+        return "luminarag"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"spec": self.spec, "model_name": self.model_name}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "ChromaEmbeddingAdapter":
+        return ChromaEmbeddingAdapter(spec=config.get("spec"), model_name=config.get("model_name"))
+
 
 class VectorStore:
-    def __init__(self, persist_directory: str, collection_name: str, embedding_function):
+    def __init__(self, persist_directory: str, collection_name: str, embedding_function,
+                 batch_size: int = 64, max_workers: int = 4, reset_on_mismatch: bool = False):
         """
         Initialize the Chroma vector database and collection.
+        The embedding model name and dimension are recorded in the collection metadata and
+        checked whenever the collection is reopened.
+        Args:
+            persist_directory: Directory of the persistent Chroma database
+            collection_name: Name of the collection to open or create
+            embedding_function: Embedder exposing embed_documents / embed_query
+            batch_size: Number of chunks embedded and written per batch
+            max_workers: Maximum number of concurrent embedding requests
+            reset_on_mismatch: Recreate the collection (dropping its chunks) instead of raising
+                EmbeddingMismatchError when it was built with another embedding model
         """
         self.client = chromadb.PersistentClient(path=persist_directory, settings=Settings(allow_reset=True))
+        self.persist_directory = persist_directory
         self.collection_name = collection_name
         self.embedding_function = embedding_function
+        self.batch_size = batch_size
+        self.scheduler = None
+        if hasattr(embedding_function, "embed_documents"):
+            self.scheduler = EmbeddingScheduler(embedding_function, batch_size=batch_size, max_workers=max_workers)
+        self._chroma_embedding_function = (
+            ChromaEmbeddingAdapter(embedding_function) if hasattr(embedding_function, "embed_documents") else None
+        )
+        self.was_reset = False
+        # Serializes writes with compaction and snapshots
+        self._write_lock = threading.RLock()
         try:
-            self.collection = self.client.get_collection(name=collection_name)
-        except Exception:
-            self.collection = self.client.create_collection(name=collection_name)
+            self.collection = self._open_collection()
+        except NotFoundError:
+            self.collection = self._recover_compaction() or self._create_collection()
+        else:
+            self._check_embedding_metadata(reset_on_mismatch)
+        # Loaded lazily on the first hybrid query
+        self.lexical_index = BM25Index(os.path.join(persist_directory, f"{collection_name}_bm25"))
+        if self.was_reset:
+            self.lexical_index.clear()
+        self.last_query_timings: Dict[str, float] = {}
+
+    def _embedding_metadata(self) -> Dict[str, Any]:
+        metadata = {}
+        model_name = embedding_model_name(self.embedding_function)
+        if model_name:
+            metadata["embedding_model"] = str(model_name)
+        dimension = getattr(self.embedding_function, "dimension", None)
+        if dimension:
+            metadata["embedding_dimension"] = int(dimension)
+        return metadata
+
+    def _open_collection(self):
+        try:
+            return self.client.get_collection(
+                name=self.collection_name, embedding_function=self._chroma_embedding_function
+            )
+        except ValueError:
+            # Collections created before the adapter was attached persist Chroma's default
+            # embedding function; all embeddings are computed here anyway
+            return self.client.get_collection(name=self.collection_name)
+
+    @property
+    def _compaction_name(self) -> str:
+        return f"{self.collection_name}__compacting"
+
+    def _recover_compaction(self):
+        # A compaction interrupted between dropping the old collection and renaming the new one
+        try:
+            collection = self.client.get_collection(name=self._compaction_name)
+        except NotFoundError:
+            return None
+        collection.modify(name=self.collection_name)
+        return self._open_collection()
+
+    def _create_collection(self):
+        return self.client.create_collection(
+            name=self.collection_name,
+            embedding_function=self._chroma_embedding_function,
+            metadata=self._embedding_metadata() or None,
+        )
+
+    def _stored_dimension(self) -> Optional[int]:
+        sample = self.collection.get(limit=1, include=["embeddings"])
+        embeddings = sample.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            return None
+        return len(embeddings[0])
+
+    def _check_embedding_metadata(self, reset_on_mismatch: bool):
+        expected = self._embedding_metadata()
+        recorded = {key: value for key, value in (self.collection.metadata or {}).items()
+                    if key in ("embedding_model", "embedding_dimension")}
+        if not recorded:
+            # Collection created before the metadata was recorded: infer what we can from the data
+            stored = self._stored_dimension()
+            if stored is not None and expected.get("embedding_dimension") not in (None, stored):
+                recorded = {"embedding_dimension": stored}
+            else:
+                if expected:
+                    self.collection.modify(metadata=dict(self.collection.metadata or {}, **expected))
+                return
+        mismatched = {key: (value, expected[key]) for key, value in recorded.items()
+                      if key in expected and expected[key] != value}
+        if not mismatched:
+            return
+        details = ", ".join(f"{key} {old!r} != {new!r}" for key, (old, new) in mismatched.items())
+        if not reset_on_mismatch:
+            raise EmbeddingMismatchError(
+                f"Collection '{self.collection_name}' was built with different embeddings ({details}); "
+                "re-index it or use the original embedding model"
+            )
+        print(f"Recreating collection '{self.collection_name}': embeddings changed ({details})")
+        self.client.delete_collection(self.collection_name)
+        self.collection = self._create_collection()
+        self.was_reset = True
 
     def add_documents(self, docs: List[str], metadatas: List[Dict[str, Any]], ids: List[str]):
         """
         Add documents and their metadata to the vector store.
+        Chunks are embedded in concurrent batches and each batch is written as soon as it is ready.
+        """
+        with self._write_lock:
+            self._add_documents(docs, metadatas, ids)
+
+    def _add_documents(self, docs: List[str], metadatas: List[Dict[str, Any]], ids: List[str]):
+        if self.scheduler is None:
+            for start in range(0, len(docs), self.batch_size):
+                end = start + self.batch_size
+                with stage("chroma_add"):
+                    self.collection.add(documents=docs[start:end], metadatas=metadatas[start:end], ids=ids[start:end])
+                with stage("bm25_add"):
+                    self.lexical_index.add(ids[start:end], docs[start:end])
+            return
+        for start, embeddings in self.scheduler.iter_batches(docs):
+            end = start + len(embeddings)
+            with stage("chroma_add"):
+                self.collection.add(
+                    documents=docs[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end],
+                    embeddings=embeddings,
+                )
+            with stage("bm25_add"):
+                self.lexical_index.add(ids[start:end], docs[start:end])
+            count("chunks_indexed", end - start)
+
+    def delete(self, ids: List[str]):
+        """
+        Remove documents from the vector store by id.
+        """
+        if ids:
+            with self._write_lock:
+                self.collection.delete(ids=ids)
+                self.lexical_index.remove(ids)
+
+    def _embed_query(self, query_text: str):
+        if hasattr(self.embedding_function, "embed_query"):
+            with stage("embed_query"):
+                return self.embedding_function.embed_query(query_text)
+        return None
+
+    def _dense_query(self, query_text: str, n_results: int, include=("documents", "metadatas", "distances"),
+                     query_embedding=None):
+        if query_embedding is None:
+            query_embedding = self._embed_query(query_text)
+        if query_embedding is not None:
+            return self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                include=list(include),
+            )
+        return self.collection.query(query_texts=[query_text], n_results=n_results, include=list(include))
+
+    def distance_space(self) -> str:
+        """
+        Distance function of the collection ("l2", "cosine" or "ip").
         """
-        self.collection.add(documents=docs, metadatas=metadatas, ids=ids)
+        return (self.collection.metadata or {}).get("hnsw:space", "l2")
 
     def query(self, query_text: str, n_results: int = 5):
         """
         Retrieve the most similar documents to the query text.
         """
-        results = self.collection.query(query_texts=[query_text], n_results=n_results)
-        return results.get('documents', []), results.get('metadatas', []) 
\ No newline at end of file
+        start = time.perf_counter()
+        results = self._dense_query(query_text, n_results)
+        self.last_query_timings = {"dense_ms": (time.perf_counter() - start) * 1000}
+        self.last_query_timings["total_ms"] = self.last_query_timings["dense_ms"]
+        return results.get('documents', []), results.get('metadatas', [])
+
+    def _embed_queries(self, query_texts: List[str]):
+        with stage("embed_query"):
+            if hasattr(self.embedding_function, "embed_queries"):
+                return self.embedding_function.embed_queries(query_texts)
+            if hasattr(self.embedding_function, "embed_query"):
+                return [self.embedding_function.embed_query(text) for text in query_texts]
+        return None
+
+    def query_batch(self, query_texts: List[str], n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+                    batch_size: int = 64) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve the most similar documents for many queries, embedding them in batches and
+        issuing one vectorized Chroma query per batch.
+        Args:
+            query_texts: The queries
+            n_results: Number of hits per query
+            where: Optional Chroma metadata filter, e.g. {"file_name": "doc2.pdf"}
+            batch_size: Number of queries embedded and searched per call
+        Returns:
+            List[List[Dict[str, Any]]]: Per query, hits with ``id``, ``document``, ``metadata``,
+            ``distance`` and ``similarity``
+        """
+        space = self.distance_space()
+        results: List[List[Dict[str, Any]]] = []
+        for start in range(0, len(query_texts), batch_size):
+            batch = query_texts[start:start + batch_size]
+            kwargs = {"n_results": n_results, "include": ["documents", "metadatas", "distances"]}
+            if where:
+                kwargs["where"] = where
+            embeddings = self._embed_queries(batch)
+            with stage("query_batch"):
+                if embeddings is not None:
+                    response = self.collection.query(query_embeddings=embeddings, **kwargs)
+                else:
+                    response = self.collection.query(query_texts=batch, **kwargs)
+            for i in range(len(batch)):
+                results.append([
+                    {
+                        "id": doc_id,
+                        "document": response["documents"][i][j],
+                        "metadata": response["metadatas"][i][j],
+                        "distance": response["distances"][i][j],
+                        "similarity": distance_to_similarity(response["distances"][i][j], space),
+                    }
+                    for j, doc_id in enumerate(response["ids"][i])
+                ])
+        return results
+
+    def rebuild_lexical_index(self, batch_size: int = 1000):
+        """
+        Rebuild the BM25 index from the documents stored in the collection.
+        """
+        # Other processes' writes to the index wait until the rebuild is complete
+        with self.lexical_index.locked():
+            self.lexical_index.clear()
+            total = self.collection.count()
+            for offset in range(0, total, batch_size):
+                batch = self.collection.get(limit=batch_size, offset=offset, include=["documents"])
+                self.lexical_index.add(batch["ids"], batch["documents"])
+            self.lexical_index.compact()
+
+    def search(self, query_text: str, n_results: int = 5, hybrid: bool = True, candidates: int = 20,
+               rrf_k: int = 60) -> List[Dict[str, Any]]:
+        """
+        Retrieve ranked hits, fusing dense similarity and BM25 rankings with reciprocal rank fusion.
+        Per-stage latencies of the call are stored in ``last_query_timings``.
+        Args:
+            query_text: The query
+            n_results: Number of hits to return
+            hybrid: Fuse with BM25; when False only dense similarity is used
+            candidates: Number of candidates taken from each ranking before fusion
+            rrf_k: Reciprocal rank fusion constant
+        Returns:
+            List[Dict[str, Any]]: Hits with ``id``, ``document``, ``metadata``, ``distance``
+            (None for lexical-only hits) and ``similarity`` (cosine-style, None if unknown)
+        """
+        timings = {}
+        start = time.perf_counter()
+        if hybrid and not self.lexical_index.exists() and self.collection.count():
+            # Chunks indexed before the lexical index existed
+            with self.lexical_index.locked():
+                if not self.lexical_index.exists():
+                    self.rebuild_lexical_index()
+        timings["lexical_load_ms"] = (time.perf_counter() - start) * 1000
+
+        started = time.perf_counter()
+        query_embedding = self._embed_query(query_text)
+        dense = self._dense_query(query_text, candidates if hybrid else n_results, query_embedding=query_embedding)
+        timings["dense_ms"] = (time.perf_counter() - started) * 1000
+
+        space = self.distance_space()
+        found: Dict[str, Dict[str, Any]] = {}
+        dense_ids = dense["ids"][0] if dense.get("ids") else []
+        for i, doc_id in enumerate(dense_ids):
+            distance = dense["distances"][0][i]
+            found[doc_id] = {
+                "id": doc_id,
+                "document": dense["documents"][0][i],
+                "metadata": dense["metadatas"][0][i],
+                "distance": distance,
+                "similarity": distance_to_similarity(distance, space),
+            }
+        if not hybrid:
+            ranked_ids = dense_ids[:n_results]
+        else:
+            started = time.perf_counter()
+            sparse = self.lexical_index.search(query_text, n_results=candidates)
+            timings["sparse_ms"] = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            fused = reciprocal_rank_fusion([dense_ids, [doc_id for doc_id, _ in sparse]], k=rrf_k)[:n_results]
+            missing = [doc_id for doc_id, _ in fused if doc_id not in found]
+            if missing:
+                extra = self.collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+                for i, doc_id in enumerate(extra["ids"]):
+                    found[doc_id] = {
+                        "id": doc_id,
+                        "document": extra["documents"][i],
+                        "metadata": extra["metadatas"][i],
+                        "distance": None,
+                        "similarity": (cosine_similarity(query_embedding, extra["embeddings"][i])
+                                       if query_embedding is not None else None),
+                    }
+            ranked_ids = [doc_id for doc_id, _ in fused if doc_id in found]
+            timings["fusion_ms"] = (time.perf_counter() - started) * 1000
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        self.last_query_timings = timings
+        for name, duration_ms in timings.items():
+            record("query" if name == "total_ms" else f"query_{name[:-3]}", duration_ms)
+        return [found[doc_id] for doc_id in ranked_ids]
+
+    def hybrid_query(self, query_text: str, n_results: int = 5, candidates: int = 20, rrf_k: int = 60,
+                     include_ids: bool = False):
+        """
+        Retrieve documents by fusing dense similarity and BM25 rankings (see search()).
+        Args:
+            query_text: The query
+            n_results: Number of documents to return
+            candidates: Number of candidates taken from each ranking before fusion
+            rrf_k: Reciprocal rank fusion constant
+            include_ids: Also return the chunk ids
+        Returns:
+            Same shape as query(): ([documents], [metadatas]), followed by [ids] when include_ids is set
+        """
+        hits = self.search(query_text, n_results=n_results, candidates=candidates, rrf_k=rrf_k)
+        documents = [[hit["document"] for hit in hits]]
+        metadatas = [[hit["metadata"] for hit in hits]]
+        if include_ids:
+            return documents, metadatas, [[hit["id"] for hit in hits]]
+        return documents, metadatas
+
+    def warm(self) -> Dict[str, float]:
+        """
+        Load the HNSW and BM25 indexes into memory ahead of the first query, e.g. at service
+        start, so that the first user request does not pay for the cold load.
+        Returns:
+            Dict[str, float]: Load times in milliseconds
+        """
+        timings = {}
+        start = time.perf_counter()
+        sample = self.collection.get(limit=1, include=["embeddings"])
+        if sample["ids"]:
+            # Chroma loads a collection's vector segment on its first query
+            self.collection.query(query_embeddings=[list(sample["embeddings"][0])], n_results=1, include=[])
+        timings["vector_index_ms"] = (time.perf_counter() - start) * 1000
+        started = time.perf_counter()
+        len(self.lexical_index)
+        timings["lexical_index_ms"] = (time.perf_counter() - started) * 1000
+        return timings
+
+    def _live_segments(self) -> set:
+        connection = sqlite3.connect(f"file:{os.path.join(self.persist_directory, 'chroma.sqlite3')}?mode=ro", uri=True)
+        try:
+            return {row[0] for row in connection.execute("SELECT id FROM segments")}
+        finally:
+            connection.close()
+
+    def _vacuum_database(self):
+        # Deleted rows only go to SQLite's freelist; VACUUM rewrites the file without them
+        connection = sqlite3.connect(os.path.join(self.persist_directory, 'chroma.sqlite3'), timeout=30,
+                                     isolation_level=None)
+        try:
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            connection.execute("VACUUM")
+        finally:
+            connection.close()
+
+    def _remove_orphaned_segments(self) -> int:
+        # Chroma leaves the HNSW files of dropped collections on disk
+        live = self._live_segments()
+        removed = 0
+        for name in os.listdir(self.persist_directory):
+            path = os.path.join(self.persist_directory, name)
+            if _SEGMENT_DIRECTORY.match(name) and os.path.isdir(path) and name not in live:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def compact(self, batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Rebuild the collection without the tombstones that deletes leave in Chroma's HNSW
+        index, remove index files of dropped collections, VACUUM chroma.sqlite3 and compact
+        the BM25 log.
+        Stored embeddings are copied, not recomputed. Another process must not write to the
+        database meanwhile; an interrupted compaction is completed when the store is next opened.
+        Returns:
+            Dict[str, Any]: Number of chunks copied, orphaned segment directories removed and
+            the database size in bytes before and after
+        """
+        with self._write_lock:
+            size_before = _directory_size(self.persist_directory)
+            try:
+                self.client.delete_collection(self._compaction_name)
+            except NotFoundError:
+                pass
+            target = self.client.create_collection(
+                name=self._compaction_name,
+                embedding_function=self._chroma_embedding_function,
+                metadata=self.collection.metadata or None,
+            )
+            copied = 0
+            total = self.collection.count()
+            for offset in range(0, total, batch_size):
+                batch = self.collection.get(limit=batch_size, offset=offset,
+                                            include=["documents", "metadatas", "embeddings"])
+                if not batch["ids"]:
+                    break
+                target.add(ids=batch["ids"], documents=batch["documents"], metadatas=batch["metadatas"],
+                           embeddings=batch["embeddings"])
+                copied += len(batch["ids"])
+            self.client.delete_collection(self.collection_name)
+            target.modify(name=self.collection_name)
+            self.collection = self._open_collection()
+            orphans = self._remove_orphaned_segments()
+            self._vacuum_database()
+            self.lexical_index.compact()
+            return {
+                "chunks": copied,
+                "orphaned_segments": orphans,
+                "bytes_before": size_before,
+                "bytes_after": _directory_size(self.persist_directory),
+            }
+
+    def snapshot(self, destination: str) -> str:
+        """
+        Write an atomic snapshot of the whole database directory (see create_snapshot);
+        writes through this store wait until it is complete.
+        """
+        with self._write_lock:
+            self.lexical_index.compact()
+            return create_snapshot(self.persist_directory, destination,
+                                   info={"collection": self.collection_name, "chunks": self.collection.count()})
+
+
+def _directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
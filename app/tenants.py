@@ -0,0 +1,123 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from app.engine import COLLECTION_NAME, VECTOR_DB_PATH, RAGEngine, build_embedding_function
+
+MAX_OPEN_TENANTS = int(os.getenv("LUMINARAG_MAX_OPEN_TENANTS", "16"))
+# Per-tenant quotas; 0 disables the limit
+TENANT_MAX_FILES = int(os.getenv("LUMINARAG_TENANT_MAX_FILES", "50"))
+TENANT_MAX_CHUNKS = int(os.getenv("LUMINARAG_TENANT_MAX_CHUNKS", "100000"))
+
+_UNSAFE_CHARACTERS = re.compile(r"[^a-zA-Z0-9_-]+")
+
+
+def tenant_collection_name(base_collection: str, tenant: str) -> str:
+    """
+    Chroma collection name of a tenant: a readable slug of the tenant id plus a short hash,
+    so that ids differing only in characters Chroma does not accept stay apart.
+    """
+    digest = hashlib.sha256(tenant.encode("utf-8")).hexdigest()[:10]
+    slug = _UNSAFE_CHARACTERS.sub("-", tenant)[:40].strip("-_")
+    return f"{base_collection}__{slug}_{digest}" if slug else f"{base_collection}__{digest}"
+
+
+class TenantRegistry:
+    """
+    One collection, manifest and BM25 index per tenant, so that tenants cannot see or
+    prune each other's documents and query cost depends only on the tenant's own corpus.
+
+    Engines are opened lazily on first use and kept in an LRU of at most ``max_open``
+    handles; evicted tenants release their in-memory lexical index and answer cache and
+    are reopened from disk on their next request. Engines that are ingesting are not evicted.
+    The embedder (and its persistent cache) is shared by all tenants.
+    """
+
+    def __init__(self, persist_directory: str = VECTOR_DB_PATH, base_collection: str = COLLECTION_NAME,
+                 max_open: int = MAX_OPEN_TENANTS, max_files: Optional[int] = TENANT_MAX_FILES or None,
+                 max_chunks: Optional[int] = TENANT_MAX_CHUNKS or None, embedding_function=None, **engine_kwargs):
+        """
+        Args:
+            persist_directory: Directory of the persistent Chroma database
+            base_collection: Prefix of the tenant collection names
+            max_open: Maximum number of tenant engines kept open
+            max_files: Per-tenant file quota (None for no limit)
+            max_chunks: Per-tenant chunk quota (None for no limit)
+            embedding_function: Embedder shared by all tenants (defaults to the configured provider)
+            **engine_kwargs: Further RAGEngine arguments applied to every tenant
+        """
+        self.persist_directory = persist_directory
+        self.base_collection = base_collection
+        self.max_open = max_open
+        self.max_files = max_files
+        self.max_chunks = max_chunks
+        self.embedding_function = embedding_function or build_embedding_function(persist_directory)
+        self.engine_kwargs = engine_kwargs
+        self._engines: "OrderedDict[str, RAGEngine]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._opening = {}
+
+    def _open(self, tenant: str) -> RAGEngine:
+        collection_name = tenant_collection_name(self.base_collection, tenant)
+        engine = RAGEngine(
+            persist_directory=self.persist_directory,
+            collection_name=collection_name,
+            embedding_function=self.embedding_function,
+            manifest_path=os.path.join(self.persist_directory, f"{collection_name}_manifest.json"),
+            max_files=self.max_files,
+            max_chunks=self.max_chunks,
+            **self.engine_kwargs,
+        )
+        # Returning users query right away; load their indexes while the page renders
+        engine.vector_store.warm()
+        return engine
+
+    def get(self, tenant: str) -> RAGEngine:
+        """
+        Return the engine of a tenant, opening its collection if it is not open yet.
+        """
+        with self._lock:
+            engine = self._engines.get(tenant)
+            if engine is not None:
+                self._engines.move_to_end(tenant)
+                # Catch up on evictions skipped while engines were busy
+                self._evict_idle()
+                return engine
+            # Open outside the registry lock so that other tenants are not blocked meanwhile
+            opening = self._opening.setdefault(tenant, threading.Lock())
+        with opening:
+            with self._lock:
+                engine = self._engines.get(tenant)
+            if engine is None:
+                engine = self._open(tenant)
+                with self._lock:
+                    self._engines[tenant] = engine
+                    self._opening.pop(tenant, None)
+                    self._evict_idle()
+        return engine
+
+    def _evict_idle(self):
+        # Engines that are ingesting stay open (the LRU may exceed max_open meanwhile): reopening
+        # the tenant would give it a second engine with its own lexical index and ingest lock
+        excess = len(self._engines) - self.max_open
+        # The most recently used engine is the one being handed out
+        for tenant in list(self._engines)[:-1]:
+            if excess <= 0:
+                break
+            if not self._engines[tenant].busy():
+                del self._engines[tenant]
+                excess -= 1
+
+    def open_tenants(self) -> List[str]:
+        """
+        Tenants with an open engine, least recently used first.
+        """
+        with self._lock:
+            return list(self._engines)
+
+    def evict(self, tenant: str):
+        with self._lock:
+            self._engines.pop(tenant, None)
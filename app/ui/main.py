@@ -1,6 +1,7 @@
 import sys
 import os
 import asyncio
+import uuid
 import streamlit as st
 
 # --- System Path for Imports ---
@@ -17,28 +18,36 @@ try:
 except RuntimeError:
     asyncio.set_event_loop(asyncio.new_event_loop())
 
-# --- App Imports ---
-from app.retrieval.vectorstore import VectorStore
-from app.retrieval.ingest import process_pdf
-from app.utils.deepseek_llm import call_groq_deepseek, filter_think_tags
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from dotenv import load_dotenv
-from app.utils.web_search import duckduckgo_search
-from app.utils.gemini_summarizer import gemini_summarize_web_results
-
-# --- Load API Keys ---
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
-
-# --- Vector Store Setup ---
-EMBEDDING_MODEL = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-VECTOR_DB_PATH = "./vector_db"
-COLLECTION_NAME = "luminarag_docs"
-vector_store = VectorStore(
-    persist_directory=VECTOR_DB_PATH,
-    collection_name=COLLECTION_NAME,
-    embedding_function=EMBEDDING_MODEL
-)
+# --- Engine Setup (registry once per process, not per rerun) ---
+@st.cache_resource(show_spinner="Loading the document index...")
+def get_tenants():
+    # chromadb and the embedder are loaded on first use, so the page renders before they are
+    from app.tenants import TenantRegistry
+    return TenantRegistry()
+
+
+@st.cache_resource
+def get_ingest_queue():
+    # One background worker per server process indexes the queued uploads of every session
+    from app.jobs import IngestQueue, IngestWorker
+    queue = IngestQueue()
+    IngestWorker(queue, get_tenants().get).start()
+    return queue
+
+
+def get_engine():
+    return get_tenants().get(st.session_state["tenant"])
+
+
+# Each browser session gets its own collection, so uploads never prune another user's documents.
+# The tenant id is kept in the URL: a refresh finds the documents and ingestion jobs again.
+if "tenant" not in st.session_state:
+    returning = "tenant" in st.query_params
+    st.session_state["tenant"] = st.query_params.get("tenant") or uuid.uuid4().hex
+    st.query_params["tenant"] = st.session_state["tenant"]
+    st.session_state["show_jobs"] = returning
+    if returning:
+        st.session_state["processed_files"] = get_engine().indexed_files()
 
 # --- Streamlit Page Setup ---
 st.set_page_config(page_title="LuminaRAG - Ask Your Document", layout="centered")
@@ -91,23 +100,50 @@ uploaded_files = st.file_uploader(
     "Upload PDF files here 👇", type=["pdf"], accept_multiple_files=True
 )
 
-if uploaded_files:
-    # Clear vector store and processed_files for new uploads
-    all_ids = vector_store.collection.get()["ids"]
-    if all_ids:
-        vector_store.collection.delete(ids=all_ids)
-    st.session_state["processed_files"] = []
-    with st.spinner("Processing and indexing uploaded files..."):
-        for file in uploaded_files:
-            if file.name not in st.session_state["processed_files"]:
-                docs = process_pdf(file)
-                if docs:
-                    ids = [f"{file.name}-{i}" for i in range(len(docs))]
-                    texts = [doc.page_content for doc in docs]
-                    metadatas = [doc.metadata for doc in docs]
-                    vector_store.add_documents(docs=texts, metadatas=metadatas, ids=ids)
-                    st.session_state["processed_files"].append(file.name)
-                    st.success(f"Ingested and indexed: {file.name}")
+# Reruns (every widget interaction) keep the same uploads; only act on files added or removed since
+# the last run. New files are indexed in the background, so the session stays usable meanwhile.
+previous_uploads = st.session_state.get("synced_uploads", {})
+current_uploads = {getattr(file, "file_id", file.name): file for file in uploaded_files or []}
+if uploaded_files and current_uploads.keys() != previous_uploads.keys():
+    removed = [name for key, name in previous_uploads.items() if key not in current_uploads]
+    if removed:
+        get_engine().remove_files(removed)
+        st.session_state["processed_files"] = get_engine().indexed_files()
+    queue = get_ingest_queue()
+    for key, file in current_uploads.items():
+        if key not in previous_uploads:
+            queue.enqueue(file, tenant=st.session_state["tenant"])
+    st.session_state["synced_uploads"] = {key: file.name for key, file in current_uploads.items()}
+    st.session_state["show_jobs"] = True
+
+
+@st.fragment(run_every=2)
+def ingest_progress():
+    jobs = get_ingest_queue().jobs(tenant=st.session_state["tenant"])
+    if not jobs:
+        return
+    finished = [job for job in jobs if job["status"] not in ("queued", "running")]
+    if len(finished) < len(jobs):
+        st.progress(len(finished) / len(jobs), text=f"Indexing uploaded files: {len(finished)}/{len(jobs)} done")
+    with st.expander(f"📥 Ingestion jobs ({len(finished)}/{len(jobs)} finished)", expanded=len(finished) < len(jobs)):
+        st.dataframe(
+            [{"File": job["file_name"], "Status": job["status"], "Progress": f"{job['progress']:.0%}",
+              "Error": job["error"] or ""} for job in jobs],
+            hide_index=True,
+        )
+    # Files become searchable one by one; show the question form as soon as the first one is
+    done = sum(job["status"] == "done" for job in jobs)
+    if done != st.session_state.get("jobs_done"):
+        st.session_state["jobs_done"] = done
+        indexed = get_engine().indexed_files()
+        if bool(indexed) != bool(st.session_state["processed_files"]):
+            st.session_state["processed_files"] = indexed
+            st.rerun()
+        st.session_state["processed_files"] = indexed
+
+
+if st.session_state["show_jobs"]:
+    ingest_progress()
 
 # --- Ask a Question Section ---
 if st.session_state["processed_files"]:
@@ -125,27 +161,20 @@ if st.session_state["processed_files"]:
             if submit and question:
                 st.write("DEBUG: Question received:", question)
                 with st.spinner("Generating answer..."):
-                    docs, metadatas = vector_store.query(question, n_results=5)
-                    st.write("DEBUG: Retrieved docs:", docs)
-                    if docs:
-                        context = "\n\n".join([doc for doc in docs[0]]) if isinstance(docs[0], list) else "\n\n".join(docs)
-                        st.write("DEBUG: Context for LLM:", context)
-                        answer = call_groq_deepseek(question, context)
-                    elif st.session_state["web_search_enabled"]:
-                        # Show a message and spinner for web search fallback
-                        with st.spinner("Searching the web and summarizing with Gemini..."):
-                            st.info("No answer found in your documents. Searching the web for the answer...", icon="🌐")
-                            web_results = duckduckgo_search(question)
-                            st.write("DEBUG: Web search results:", web_results)
-                            answer = gemini_summarize_web_results(question, web_results)
-                    else:
-                        st.write("DEBUG: No docs found, calling LLM with empty context.")
-                        answer = call_groq_deepseek(question, "")
-                    st.write("DEBUG: Raw LLM answer:", answer)
-                clean_answer = filter_think_tags(answer)
+                    result, tokens = get_engine().answer_stream(
+                        question, n_results=5, web_search=st.session_state["web_search_enabled"]
+                    )
+                    if result["source"] == "web":
+                        st.info("No answer found in your documents. Answered from the web with Gemini.", icon="🌐")
+                    st.write("DEBUG: Context for LLM:", result["context"])
+                # Render tokens as they arrive; <think> spans are stripped on the fly
+                st.write_stream(tokens)
+                st.write("DEBUG: Raw LLM answer:", result["raw_answer"])
+                clean_answer = result["answer"]
                 st.session_state.chat_history.append({"question": question, "answer": clean_answer})
                 st.session_state["last_answer"] = clean_answer
                 st.session_state["last_question"] = question
+                st.session_state["last_trace"] = {"trace_id": result["trace_id"], "timings": result.get("timings", {})}
                 st.rerun()
 
         st.markdown("</div>", unsafe_allow_html=True)
@@ -155,6 +184,9 @@ if "last_question" in st.session_state and st.session_state["last_question"]:
     st.markdown(f"**❓ {st.session_state['last_question']}**")
 if "last_answer" in st.session_state and st.session_state["last_answer"]:
     st.success(st.session_state["last_answer"])
+    if st.session_state.get("last_trace"):
+        with st.expander(f"⏱️ Stage timings (trace {st.session_state['last_trace']['trace_id']})"):
+            st.table({stage: f"{ms:.1f} ms" for stage, ms in st.session_state["last_trace"]["timings"].items()})
 
 else:
     if not st.session_state["processed_files"]:
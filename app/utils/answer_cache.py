@@ -0,0 +1,108 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def context_fingerprint(chunk_ids: Iterable[str], *extra: str) -> str:
+    """
+    Order-independent fingerprint of the retrieved chunk ids (plus any extra key parts).
+    """
+    digest = hashlib.sha256()
+    for part in sorted(chunk_ids):
+        digest.update(part.encode("utf-8") + b"\0")
+    for part in extra:
+        digest.update(b"\1" + part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    In-memory answer cache keyed by query embedding similarity and the set of retrieved chunk ids.
+
+    A cached answer is only reused when the new query retrieved exactly the same
+    chunks, so re-indexing the corpus invalidates affected entries automatically.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600.0, max_entries: int = 1000):
+        """
+        Args:
+            similarity_threshold: Minimum cosine similarity between query embeddings for a hit
+            ttl_seconds: Lifetime of a cached answer
+            max_entries: Maximum number of cached answers (least recently used are evicted)
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_fingerprint: Dict[str, set] = {}
+        self._next_id = 0
+
+    def _drop(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        bucket = self._by_fingerprint.get(entry["fingerprint"])
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._by_fingerprint[entry["fingerprint"]]
+
+    def get(self, query_embedding: List[float], fingerprint: str) -> Optional[Any]:
+        """
+        Return the cached value for a similar query with the same context fingerprint, or None.
+        """
+        query = _normalize(query_embedding)
+        now = time.time()
+        with self._lock:
+            best_id, best_score = None, self.similarity_threshold
+            for entry_id in list(self._by_fingerprint.get(fingerprint, ())):
+                entry = self._entries[entry_id]
+                if now - entry["created"] > self.ttl_seconds:
+                    self._drop(entry_id)
+                    continue
+                score = sum(a * b for a, b in zip(query, entry["embedding"]))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id]["value"]
+
+    def put(self, query_embedding: List[float], fingerprint: str, value: Any):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "embedding": _normalize(query_embedding),
+                "fingerprint": fingerprint,
+                "value": value,
+                "created": time.time(),
+            }
+            self._by_fingerprint.setdefault(fingerprint, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_fingerprint.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
@@ -1,7 +1,11 @@
 import os
-import requests
+import json
 from dotenv import load_dotenv
 import re
+import time
+from app.retrieval.context import estimate_tokens
+from app.utils.http_client import ProviderError, get_client
+from app.utils.metrics import count, record, stage
 
 load_dotenv()
 
@@ -9,16 +13,15 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 
 
-def call_groq_deepseek(prompt, context="", model="deepseek-r1-distill-llama-70b"):
+class GroqAPIError(ProviderError):
     """
-    Call the DeepSeek model via Groq Cloud API to generate an answer given a prompt and optional context.
-    Args:
-        prompt (str): The user's question.
-        context (str): Retrieved context from documents.
-        model (str): Model name (default: deepseek-r1-distill-llama-70b)
-    Returns:
-        str: The generated answer from DeepSeek via Groq.
+    Raised when a Groq completion fails, including part-way through a stream.
     """
+
+    label = "Groq API Error"
+
+
+def _groq_request(prompt, context, model, stream=False):
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
@@ -30,15 +33,177 @@ def call_groq_deepseek(prompt, context="", model="deepseek-r1-distill-llama-70b"
             {"role": "user", "content": f"Context: {context}\n\nQuestion: {prompt}"}
         ]
     }
+    if stream:
+        data["stream"] = True
+    return headers, data
+
+
+def _count_tokens(usage, prompt, context, completion):
+    # Groq reports usage; fall back to an estimate when it does not
+    usage = usage or {}
+    count("tokens", usage.get("prompt_tokens") or estimate_tokens(f"Context: {context}\n\nQuestion: {prompt}"),
+          kind="prompt")
+    count("tokens", usage.get("completion_tokens") or estimate_tokens(completion), kind="completion")
+
+
+def call_groq_deepseek(prompt, context="", model="deepseek-r1-distill-llama-70b"):
+    """
+    Call the DeepSeek model via Groq Cloud API to generate an answer given a prompt and optional context.
+    Args:
+        prompt (str): The user's question.
+        context (str): Retrieved context from documents.
+        model (str): Model name (default: deepseek-r1-distill-llama-70b)
+    Returns:
+        str: The generated answer from DeepSeek via Groq.
+    Raises:
+        GroqAPIError: If the request fails
+    """
+    headers, data = _groq_request(prompt, context, model)
+    try:
+        with stage("groq_completion"):
+            response = get_client("groq").request("POST", GROQ_API_URL, headers=headers, json=data)
+            response.raise_for_status()
+        body = response.json()
+        content = body["choices"][0]["message"]["content"]
+        _count_tokens(body.get("usage"), prompt, context, content)
+        return content
+    except Exception as e:
+        count("llm_errors", provider="groq")
+        raise GroqAPIError(str(e)) from e
+
+def stream_groq_deepseek(prompt, context="", model="deepseek-r1-distill-llama-70b"):
+    """
+    Stream the DeepSeek completion from the Groq Cloud API token by token.
+    Args:
+        prompt (str): The user's question.
+        context (str): Retrieved context from documents.
+        model (str): Model name (default: deepseek-r1-distill-llama-70b)
+    Yields:
+        str: Pieces of the completion as they arrive (including any <think> blocks).
+    Raises:
+        GroqAPIError: If the request fails, possibly after some pieces were yielded
+    """
+    headers, data = _groq_request(prompt, context, model, stream=True)
+    start = time.perf_counter()
+    first_token = True
+    pieces = []
+    usage = None
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        with get_client("groq").stream("POST", GROQ_API_URL, headers=headers, json=data) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                event = json.loads(payload)
+                usage = event.get("usage") or (event.get("x_groq") or {}).get("usage") or usage
+                choices = event.get("choices") or [{}]
+                piece = choices[0].get("delta", {}).get("content")
+                if piece:
+                    if first_token:
+                        record("groq_first_token", (time.perf_counter() - start) * 1000)
+                        first_token = False
+                    pieces.append(piece)
+                    yield piece
+        _count_tokens(usage, prompt, context, "".join(pieces))
     except Exception as e:
-        return f"[Groq API Error] {str(e)}"
+        count("llm_errors", provider="groq")
+        raise GroqAPIError(str(e)) from e
+    finally:
+        # Includes the time the consumer spent rendering between pieces
+        record("groq_completion", (time.perf_counter() - start) * 1000)
+
+
+class ThinkTagFilter:
+    """
+    Streaming counterpart of filter_think_tags: feed pieces of a response and
+    get back only the text outside <think>...</think> blocks, even when a tag
+    is split across pieces.
+    """
+
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self._pending = ""
+        self._hidden = ""
+        self._in_think = False
+
+    @staticmethod
+    def _partial_tag_length(text, tag):
+        # Length of the longest suffix of text that is a proper prefix of tag
+        for length in range(min(len(text), len(tag) - 1), 0, -1):
+            if text.endswith(tag[:length]):
+                return length
+        return 0
+
+    def feed(self, piece):
+        """
+        Consume a piece of the response and return the newly visible text.
+        """
+        visible = []
+        if self._in_think:
+            self._hidden += piece
+        else:
+            self._pending += piece
+        while True:
+            if not self._in_think:
+                start = self._pending.find(self.OPEN)
+                if start == -1:
+                    keep = self._partial_tag_length(self._pending, self.OPEN)
+                    visible.append(self._pending[:len(self._pending) - keep])
+                    self._pending = self._pending[len(self._pending) - keep:]
+                    break
+                visible.append(self._pending[:start])
+                self._hidden = self._pending[start + len(self.OPEN):]
+                self._pending = ""
+                self._in_think = True
+            else:
+                end = self._hidden.find(self.CLOSE)
+                if end == -1:
+                    break
+                self._pending = self._hidden[end + len(self.CLOSE):]
+                self._hidden = ""
+                self._in_think = False
+        return "".join(visible)
+
+    def flush(self):
+        """
+        Return any text still held back at the end of the stream.
+        An unclosed <think> block is kept, matching filter_think_tags.
+        """
+        if self._in_think:
+            remainder = self.OPEN + self._hidden
+        else:
+            remainder = self._pending
+        self._pending, self._hidden, self._in_think = "", "", False
+        return remainder
+
+
+def filter_think_tags_stream(pieces):
+    """
+    Yield the visible text of a streamed response with <think>...</think> spans removed on the fly.
+    """
+    think_filter = ThinkTagFilter()
+    elapsed = 0.0
+    for piece in pieces:
+        start = time.perf_counter()
+        visible = think_filter.feed(piece)
+        elapsed += time.perf_counter() - start
+        if visible:
+            yield visible
+    remainder = think_filter.flush()
+    # Filtering time only, not the time spent waiting for pieces
+    record("think_filter", elapsed * 1000)
+    if remainder:
+        yield remainder
+
 
 def filter_think_tags(response):
     """
     Remove content within <think>...</think> tags from the response.
     """
-    return re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL) 
\ No newline at end of file
+    with stage("think_filter"):
+        return re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL) 
\ No newline at end of file
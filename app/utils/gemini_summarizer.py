@@ -1,9 +1,46 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
+import time
+from app.utils.http_client import DEFAULT_TIMEOUT, ProviderError, get_client
+from app.utils.metrics import count, record, stage
 
 load_dotenv()
 
+GEMINI_MODEL = "gemini-2.5-flash"
+
+
+class GeminiAPIError(ProviderError):
+    """
+    Raised when a Gemini summary fails, including part-way through a stream.
+    """
+
+    label = "Gemini API Error"
+
+
+@lru_cache(maxsize=None)
+def get_gemini_model(model=GEMINI_MODEL):
+    """
+    Return a process-wide Gemini chat client, so connections are reused across calls.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, timeout=DEFAULT_TIMEOUT[1], max_retries=2)
+
+def _summary_prompt(query, web_results):
+    return f"""
+    You are a helpful assistant. Given the following web search results, answer the user's question as accurately and concisely as possible.
+    
+    User Question: {query}
+    
+    Web Search Results:
+    {web_results}
+    """
+
+def _count_tokens(usage):
+    if usage:
+        count("tokens", usage.get("input_tokens", 0), kind="gemini_prompt")
+        count("tokens", usage.get("output_tokens", 0), kind="gemini_completion")
+
 def gemini_summarize_web_results(query, web_results):
     """
     Use Gemini to summarize web search results for a user query.
@@ -12,15 +49,47 @@ def gemini_summarize_web_results(query, web_results):
         web_results (str): The web search snippets.
     Returns:
         str: Gemini's summarized answer.
+    Raises:
+        GeminiAPIError: If the request fails
     """
-    model = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
-    prompt = f"""
-    You are a helpful assistant. Given the following web search results, answer the user's question as accurately and concisely as possible.
-    
-    User Question: {query}
-    
-    Web Search Results:
-    {web_results}
+    prompt = _summary_prompt(query, web_results)
+    try:
+        with get_client("gemini").slot(), stage("gemini_summarize"):
+            response = get_gemini_model().invoke(prompt)
+    except Exception as e:
+        count("llm_errors", provider="gemini")
+        raise GeminiAPIError(str(e)) from e
+    _count_tokens(getattr(response, "usage_metadata", None))
+    return response.content if hasattr(response, 'content') else str(response)
+
+def stream_gemini_summary(query, web_results):
+    """
+    Stream Gemini's summary of web search results for a user query.
+    Args:
+        query (str): The user's question.
+        web_results (str): The web search snippets.
+    Yields:
+        str: Pieces of Gemini's answer as they arrive.
+    Raises:
+        GeminiAPIError: If the request fails, possibly after some pieces were yielded
     """
-    response = model.invoke(prompt)
-    return response.content if hasattr(response, 'content') else str(response) 
\ No newline at end of file
+    start = time.perf_counter()
+    first_token = True
+    usage = None
+    try:
+        with get_client("gemini").slot():
+            for chunk in get_gemini_model().stream(_summary_prompt(query, web_results)):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                content = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                if isinstance(content, list):
+                    content = "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+                if content:
+                    if first_token:
+                        record("gemini_first_token", (time.perf_counter() - start) * 1000)
+                        first_token = False
+                    yield content
+    except Exception as e:
+        count("llm_errors", provider="gemini")
+        raise GeminiAPIError(str(e)) from e
+    record("gemini_summarize", (time.perf_counter() - start) * 1000)
+    _count_tokens(usage)
\ No newline at end of file
@@ -0,0 +1,151 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 60)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Methods that are safe to resend after the server may already have acted on them
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+# Statuses that mean the request was not processed, so other methods (e.g. a paid POST) can be resent too
+NOT_PROCESSED_STATUSES = {429, 503}
+
+# Maximum concurrent requests per provider
+PROVIDER_LIMITS = {
+    "groq": 8,
+    "gemini": 8,
+    "duckduckgo": 4,
+}
+
+
+class ProviderError(RuntimeError):
+    """
+    Base class of the errors raised when a call to an LLM provider fails.
+    """
+
+    # Shown in front of the message when the error is reported to the user
+    label = "Provider Error"
+
+
+def _connect_failed(error):
+    """
+    Whether a requests exception was raised before the connection was established,
+    i.e. the request never reached the server.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError; NewConnectionError subclasses ConnectTimeoutError
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, ConnectTimeoutError)
+
+
+class ProviderClient:
+    """
+    Shared outbound client for one provider: a pooled keep-alive requests.Session,
+    default timeouts, retries with jittered exponential backoff and a cap on
+    concurrent requests. Non-idempotent requests (POST, PATCH) are only resent
+    when they cannot have been processed: on connect errors and 429/503 responses.
+    """
+
+    def __init__(self, name, max_concurrency=4, max_retries=3, base_delay=0.5, max_delay=8.0,
+                 timeout=DEFAULT_TIMEOUT):
+        """
+        Args:
+            name (str): Provider name, used in error messages.
+            max_concurrency (int): Maximum number of requests in flight.
+            max_retries (int): Retries on connection errors, timeouts and retryable statuses
+                (for non-idempotent methods only on connect errors and 429/503).
+            base_delay (float): Initial backoff delay in seconds.
+            max_delay (float): Upper bound for a single backoff delay in seconds.
+            timeout: Default requests timeout, as seconds or a (connect, read) tuple.
+        """
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one of the provider's concurrency slots, e.g. around SDK calls that do not use this session.
+        """
+        with self._slots:
+            yield
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = min(self.max_delay, float(retry_after))
+        else:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        time.sleep(delay)
+
+    def _send(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else NOT_PROCESSED_STATUSES
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A read timeout or dropped connection may come after the server acted on the request
+                if attempt >= self.max_retries or not (idempotent or _connect_failed(e)):
+                    raise
+                self._backoff(attempt)
+                attempt += 1
+                continue
+            if response.status_code in retry_statuses and attempt < self.max_retries:
+                response.close()
+                self._backoff(attempt, response)
+                attempt += 1
+                continue
+            return response
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request with pooling, timeout, retries and the concurrency limit applied.
+        Returns:
+            requests.Response: The final response (not raised for status).
+        """
+        with self._slots:
+            return self._send(method, url, **kwargs)
+
+    @contextmanager
+    def stream(self, method, url, **kwargs):
+        """
+        Send a streaming request; the concurrency slot is held until the body has been consumed.
+        """
+        with self._slots:
+            response = self._send(method, url, stream=True, **kwargs)
+            try:
+                yield response
+            finally:
+                response.close()
+
+    async def arequest(self, method, url, **kwargs):
+        """
+        Async variant of request() that runs the pooled session off the event loop.
+        """
+        return await asyncio.to_thread(self.request, method, url, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def get_client(provider):
+    """
+    Return the process-wide client for a provider.
+    """
+    return ProviderClient(provider, max_concurrency=PROVIDER_LIMITS.get(provider, 4))
@@ -0,0 +1,288 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+# Upper bounds of the latency buckets, in milliseconds
+DEFAULT_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram (Prometheus style) with quantile estimates.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by linear interpolation inside the bucket that contains it.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_ms": self.sum,
+            "mean_ms": self.sum / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max,
+        }
+
+
+class Trace:
+    """
+    Stage spans and attributes (token counts, cache hits, ...) of one question.
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.spans: List[Tuple[str, float, float]] = []
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.total_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, duration_ms: float):
+        with self._lock:
+            self.spans.append((stage, (time.perf_counter() - self._start) * 1000 - duration_ms, duration_ms))
+
+    def add(self, key: str, value: float):
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def timings(self) -> Dict[str, float]:
+        """
+        Total milliseconds per stage.
+        """
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for stage, _, duration_ms in self.spans:
+                totals[stage] = totals.get(stage, 0.0) + duration_ms
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [{"stage": stage, "offset_ms": offset, "duration_ms": duration}
+                     for stage, offset, duration in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started": self.started,
+            "total_ms": self.total_ms,
+            "attributes": dict(self.attributes),
+            "spans": spans,
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-wide stage latency histograms, counters and the most recent traces.
+    """
+
+    def __init__(self, max_traces: int = 200):
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.traces: "deque[Trace]" = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, duration_ms: float):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(duration_ms)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_trace(self, trace: Trace):
+        with self._lock:
+            self.traces.append(trace)
+
+    def get_trace(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return next((trace for trace in self.traces if trace.trace_id == trace_id), None)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.traces.clear()
+
+    def _cache_hit_rates(self) -> Dict[str, float]:
+        lookups: Dict[str, Dict[str, float]] = {}
+        for (name, labels), value in self.counters.items():
+            if name == "cache_lookups":
+                labels = dict(labels)
+                lookups.setdefault(labels["cache"], {}).setdefault(labels["result"], 0)
+                lookups[labels["cache"]][labels["result"]] += value
+        return {cache: counts.get("hit", 0) / max(1, counts.get("hit", 0) + counts.get("miss", 0))
+                for cache, counts in lookups.items()}
+
+    def to_dict(self, traces: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {stage: histogram.to_dict() for stage, histogram in sorted(self.histograms.items())},
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "cache_hit_rates": self._cache_hit_rates(),
+                "recent_traces": [trace.to_dict() for trace in list(self.traces)[-traces:]] if traces else [],
+            }
+
+    def to_json(self, traces: int = 20) -> str:
+        return json.dumps(self.to_dict(traces=traces), indent=2)
+
+    def to_prometheus(self, prefix: str = "luminarag") -> str:
+        """
+        Render the histograms (in seconds) and counters in the Prometheus text exposition format.
+        """
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Latency of pipeline stages",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound / 1000:g}"}} '
+                                 f"{cumulative}")
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum / 1000:.6f}')
+                lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                for (counter, labels), value in sorted(self.counters.items()):
+                    if counter != name:
+                        continue
+                    label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                    lines.append(f"{prefix}_{name}_total{{{label_text}}} {value:g}" if label_text
+                                 else f"{prefix}_{name}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("luminarag_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record(stage_name: str, duration_ms: float, trace: Optional[Trace] = None):
+    """
+    Record an already measured stage duration in the histograms and the current trace.
+    """
+    METRICS.observe(stage_name, duration_ms)
+    trace = trace or _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage_name, duration_ms)
+
+
+@contextmanager
+def stage(stage_name: str, trace: Optional[Trace] = None):
+    """
+    Time the enclosed block as one pipeline stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage_name, (time.perf_counter() - start) * 1000, trace)
+
+
+def count(name: str, value: float = 1, trace: Optional[Trace] = None, **labels):
+    """
+    Increment a counter, e.g. count("tokens", 120, kind="prompt"); the current trace keeps a per-question total.
+    """
+    METRICS.increment(name, value, **labels)
+    trace = trace or _current_trace.get()
+    if trace is not None:
+        trace.add("_".join([name] + [str(v) for _, v in sorted(labels.items())]), value)
+
+
+def cache_lookup(cache: str, hits: int = 0, misses: int = 0):
+    """
+    Count cache hits and misses; hit rates are derived in the exports.
+    """
+    if hits:
+        count("cache_lookups", hits, cache=cache, result="hit")
+    if misses:
+        count("cache_lookups", misses, cache=cache, result="miss")
+
+
+@contextmanager
+def activate(trace: Trace):
+    """
+    Make trace the current trace inside the block (e.g. while a stream is being consumed).
+    """
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def start_trace(name: str = "question", **attributes) -> Trace:
+    return Trace(name, **attributes)
+
+
+def finish_trace(trace: Trace):
+    """
+    Close a trace: record its total latency and keep it among the recent traces.
+    """
+    if trace.total_ms is None:
+        trace.total_ms = (time.perf_counter() - trace._start) * 1000
+        METRICS.observe(f"{trace.name}_total", trace.total_ms)
+        METRICS.add_trace(trace)
+
+
+@contextmanager
+def traced(name: str = "question", **attributes):
+    """
+    Run the enclosed block as one trace: stages timed inside it are recorded as its spans.
+    """
+    trace = start_trace(name, **attributes)
+    with activate(trace):
+        try:
+            yield trace
+        finally:
+            finish_trace(trace)
@@ -1,4 +1,5 @@
-import requests
+from app.utils.http_client import get_client
+from app.utils.metrics import stage
 
 def duckduckgo_search(query, max_results=5):
     """
@@ -9,9 +10,10 @@ def duckduckgo_search(query, max_results=5):
     Returns:
         str: Concatenated snippets from the top results.
     """
-    url = f"https://duckduckgo.com/html/?q={query}"
+    url = "https://duckduckgo.com/html/"
     headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(url, headers=headers)
+    with stage("duckduckgo_request"):
+        response = get_client("duckduckgo").request("GET", url, params={"q": query}, headers=headers)
     snippets = []
     if response.status_code == 200:
         from bs4 import BeautifulSoup
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Cold import budget per entry point, in milliseconds. app.retrieval.manifest is everything the
+# Streamlit page imports before its first paint; app.engine is paid once, when the first engine opens.
+IMPORT_BUDGETS_MS = {
+    "app.retrieval.manifest": 250,
+    "app.utils.web_search": 400,
+    "app.engine": 2500,
+}
+
+# Heavy modules each entry point must leave to the code paths that use them
+DEFERRED_MODULES = {
+    "app.retrieval.manifest": ("chromadb", "langchain", "langchain_community", "langchain_core", "bs4",
+                               "langchain_google_genai"),
+    "app.utils.web_search": ("bs4",),
+    "app.engine": ("langchain", "langchain_community", "bs4", "langchain_google_genai", "sentence_transformers"),
+}
+
+
+def measure_import(module: str) -> Dict[str, Any]:
+    """
+    Import module in a fresh interpreter with ``-X importtime``.
+    Returns:
+        Dict[str, Any]: Cumulative import time of the module in milliseconds, the five slowest
+        imports it triggered and the top-level packages it loaded
+    """
+    code = f"import sys, json, {module}; print(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT,
+                             capture_output=True, text=True, check=True)
+    # Lines look like "import time:  self [us] | cumulative | <indent>name"
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((name.strip(), int(cumulative) / 1000, len(name) - len(name.lstrip())))
+    # Children are printed before their parent, one indentation level deeper
+    index = max(i for i, (name, _, _) in enumerate(imports) if name == module)
+    _, total_ms, indent = imports[index]
+    children = []
+    for item in reversed(imports[:index]):
+        if item[2] <= indent:
+            break
+        if item[2] == indent + 2:
+            children.append(item)
+    slowest = sorted(children, key=lambda item: -item[1])[:5]
+    return {
+        "ms": total_ms,
+        "slowest": [{"module": name, "ms": ms} for name, ms, _ in slowest],
+        "packages": json.loads(process.stdout),
+    }
+
+
+def check_budgets(budgets: Dict[str, float] = None, repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    Measure every entry point (best of repeat cold imports) against its budget and deferred modules.
+    Returns:
+        List[Dict[str, Any]]: One row per entry point, with ``over_budget`` and ``eager`` (deferred
+        modules that were imported anyway)
+    """
+    rows = []
+    for module, budget_ms in (budgets or IMPORT_BUDGETS_MS).items():
+        runs = [measure_import(module) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["ms"])
+        eager = [name for name in DEFERRED_MODULES.get(module, ()) if name in best["packages"]]
+        rows.append({
+            "module": module,
+            "ms": best["ms"],
+            "budget_ms": budget_ms,
+            "over_budget": best["ms"] > budget_ms,
+            "eager": eager,
+            "slowest": best["slowest"],
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold import time of the app entry points against a budget")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold imports per module (the best one counts)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the budgets, e.g. on slow CI machines")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    parser.add_argument("--fail-on-budget", action="store_true",
+                        help="Exit with status 1 when a budget is exceeded or a deferred module is imported")
+    args = parser.parse_args(argv)
+
+    rows = check_budgets({module: ms * args.scale for module, ms in IMPORT_BUDGETS_MS.items()}, args.repeat)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for row in rows:
+            flag = "OVER BUDGET" if row["over_budget"] else ""
+            print(f"{row['module']:<28} {row['ms']:8.1f} ms / {row['budget_ms']:6.0f} ms  {flag}")
+            if row["eager"]:
+                print(f"  imported eagerly: {', '.join(row['eager'])}")
+            for item in row["slowest"]:
+                print(f"    {item['module']:<40} {item['ms']:8.1f} ms")
+    failed = [row for row in rows if row["over_budget"] or row["eager"]]
+    return 1 if failed and args.fail_on_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
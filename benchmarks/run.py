@@ -0,0 +1,397 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from importlib import metadata
+from typing import Any, Dict, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.engine import open_local_files
+from app.retrieval.embeddings import HashingEmbeddings
+from app.retrieval.chunker import DEFAULT_CHUNKING
+from app.retrieval.ingest import process_pdf, split_texts
+from app.retrieval.manifest import IngestManifest
+from app.retrieval.vectorstore import VectorStore
+from app.utils.metrics import METRICS
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_PDFS = [
+    os.path.join(REPO_ROOT, "doc2.pdf"),
+    os.path.join(REPO_ROOT, "The Rise of Generative AI in Creative Industries (1).pdf"),
+]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+TRACKED_PACKAGES = ("chromadb", "langchain", "langchain-community", "langchain-text-splitters", "pypdf")
+
+# Direction of each reported metric: +1 higher is better, -1 lower is better
+METRIC_DIRECTIONS = {
+    "pages_per_sec": 1,
+    "chunks_per_sec": 1,
+    "p50_ms": -1,
+    "p95_ms": -1,
+    "p99_ms": -1,
+    "peak_rss_mb": -1,
+    "vs_split_texts": 1,
+}
+
+
+# --- Memory ---
+
+def _reset_peak_rss() -> bool:
+    # Linux resets the VmHWM high-water mark on this write; elsewhere the peak is process-wide
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _Stage:
+    """
+    Times a benchmark stage and records the peak RSS reached during it.
+    """
+
+    def __enter__(self):
+        _reset_peak_rss()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        self.peak_rss_mb = _peak_rss_mb()
+        return False
+
+
+def _latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+
+    def percentile(q):
+        # Nearest-rank percentile
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "queries": len(ordered),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": sum(ordered) / len(ordered),
+    }
+
+
+# --- Corpus ---
+
+def build_scaled_pdf(sources: List[str], scale: int, path: str) -> str:
+    """
+    Write a synthetic corpus made of ``scale`` copies of the pages of the source PDFs.
+    """
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for _ in range(scale):
+        for source in sources:
+            writer.append(source)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def make_queries(chunks: List[str], count: int, seed: int = 0) -> List[str]:
+    """
+    Deterministic query set: short word spans sampled from the indexed chunks.
+    """
+    rng = random.Random(seed)
+    queries = []
+    candidates = [chunk.split() for chunk in chunks if len(chunk.split()) >= 12]
+    for _ in range(count):
+        words = rng.choice(candidates)
+        start = rng.randrange(0, len(words) - 8)
+        queries.append(" ".join(words[start:start + rng.randint(4, 8)]))
+    return queries
+
+
+# --- Stages ---
+
+def bench_parse(pdf_path: str, chunk_size: int, chunk_overlap: int):
+    """
+    Parse and chunk one PDF with process_pdf, then re-split the parsed pages with split_texts alone,
+    once with the recursive character splitter and once with the token chunker.
+    Returns:
+        Tuple[Dict[str, Any], List[Document]]: Stage results and the chunks
+    """
+    from langchain_community.document_loaders import PyPDFLoader
+    upload = open_local_files([pdf_path])[0]
+    try:
+        with _Stage() as stage:
+            chunks = process_pdf(upload, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    finally:
+        upload.close()
+    pages = PyPDFLoader(pdf_path).load()
+    with _Stage() as split_stage:
+        split = split_texts(pages, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    token_size, token_overlap = DEFAULT_CHUNKING["token"]
+    with _Stage() as token_stage:
+        token_split = split_texts(pages, chunk_size=token_size, chunk_overlap=token_overlap, chunker="token")
+    return {
+        "process_pdf": {
+            "pages": len(pages),
+            "chunks": len(chunks),
+            "seconds": stage.seconds,
+            "pages_per_sec": len(pages) / stage.seconds,
+            "chunks_per_sec": len(chunks) / stage.seconds,
+            "peak_rss_mb": stage.peak_rss_mb,
+        },
+        "split_texts": {
+            "chunks": len(split),
+            "seconds": split_stage.seconds,
+            "pages_per_sec": len(pages) / split_stage.seconds,
+            "chunks_per_sec": len(split) / split_stage.seconds,
+            "peak_rss_mb": split_stage.peak_rss_mb,
+        },
+        "token_chunker": {
+            "chunks": len(token_split),
+            "seconds": token_stage.seconds,
+            "pages_per_sec": len(pages) / token_stage.seconds,
+            "chunks_per_sec": len(token_split) / token_stage.seconds,
+            # Page throughput relative to the recursive splitter (above 1 = faster)
+            "vs_split_texts": split_stage.seconds / token_stage.seconds,
+            "peak_rss_mb": token_stage.peak_rss_mb,
+        },
+    }, chunks
+
+
+def bench_index(store: VectorStore, chunks) -> Dict[str, Any]:
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    ids = [f"chunk-{i}" for i in range(len(chunks))]
+    with _Stage() as stage:
+        store.add_documents(texts, metadatas, ids)
+    return {
+        "chunks": len(chunks),
+        "seconds": stage.seconds,
+        "chunks_per_sec": len(chunks) / stage.seconds,
+        "peak_rss_mb": stage.peak_rss_mb,
+    }
+
+
+def bench_queries(query_fn, queries: List[str], warmup: int = 5) -> Dict[str, Any]:
+    for query in queries[:warmup]:
+        query_fn(query)
+    samples = []
+    with _Stage() as stage:
+        for query in queries:
+            start = time.perf_counter()
+            query_fn(query)
+            samples.append((time.perf_counter() - start) * 1000)
+    return dict(_latency_summary(samples), peak_rss_mb=stage.peak_rss_mb)
+
+
+def _stub_llm(prompt, context="", model=None):
+    # Stands in for the Groq call so that answer() latency reflects only the local pipeline
+    return f"<think>{len(context)} characters of context</think>Stub answer to: {prompt}"
+
+
+def bench_answers(persist_directory: str, collection_name: str, embedder, queries: List[str]) -> Dict[str, Any]:
+    import app.engine as engine_module
+    original = engine_module.call_groq_deepseek
+    engine_module.call_groq_deepseek = _stub_llm
+    try:
+        # An existing manifest keeps the engine from wiping the untracked benchmark chunks
+        manifest_path = os.path.join(persist_directory, f"{collection_name}_manifest.json")
+        IngestManifest(manifest_path).save()
+        engine = engine_module.RAGEngine(
+            persist_directory=persist_directory,
+            collection_name=collection_name,
+            embedding_function=embedder,
+            answer_cache=False,
+            similarity_threshold=None,
+            manifest_path=manifest_path,
+        )
+        return bench_queries(lambda question: engine.answer(question), queries)
+    finally:
+        engine_module.call_groq_deepseek = original
+
+
+def run_benchmarks(pdfs: List[str], scales: List[int], queries: int, chunk_size: int = 1000,
+                   chunk_overlap: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """
+    Run every stage on each scaled corpus.
+    Returns:
+        Dict[str, Any]: Environment description and, per scale, the stage results
+    """
+    results: Dict[str, Any] = {"environment": _environment(), "config": {
+        "pdfs": [os.path.basename(pdf) for pdf in pdfs], "scales": scales, "queries": queries,
+        "chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "seed": seed,
+    }, "scales": {}}
+    workdir = tempfile.mkdtemp(prefix="luminarag-bench-")
+    try:
+        for scale in scales:
+            METRICS.reset()
+            pdf_path = build_scaled_pdf(pdfs, scale, os.path.join(workdir, f"corpus_x{scale}.pdf"))
+            parse, chunks = bench_parse(pdf_path, chunk_size, chunk_overlap)
+            persist_directory = os.path.join(workdir, f"db_x{scale}")
+            embedder = HashingEmbeddings(dimension=384, seed=seed)
+            store = VectorStore(persist_directory, "bench_docs", embedder)
+            index = bench_index(store, chunks)
+            question_set = make_queries([chunk.page_content for chunk in chunks], queries, seed=seed)
+            scale_results = dict(parse)
+            scale_results["add_documents"] = index
+            scale_results["query"] = bench_queries(lambda q: store.query(q, n_results=5), question_set)
+            scale_results["hybrid_search"] = bench_queries(lambda q: store.search(q, n_results=5), question_set)
+            scale_results["answer"] = bench_answers(persist_directory, "bench_docs", embedder, question_set)
+            scale_results["stages"] = METRICS.to_dict(traces=0)["stages"]
+            results["scales"][f"x{scale}"] = scale_results
+            print(_format_scale(f"x{scale}", scale_results), flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _environment() -> Dict[str, Any]:
+    versions = {}
+    for package in TRACKED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+    }
+
+
+# --- Reporting ---
+
+def _format_scale(name: str, results: Dict[str, Any]) -> str:
+    parse, index = results["process_pdf"], results["add_documents"]
+    lines = [
+        f"[{name}] {parse['pages']} pages, {parse['chunks']} chunks",
+        f"  process_pdf    {parse['pages_per_sec']:9.1f} pages/s {parse['chunks_per_sec']:9.1f} chunks/s"
+        f"  peak RSS {parse['peak_rss_mb']:.0f} MB",
+        f"  split_texts    {results['split_texts']['pages_per_sec']:9.1f} pages/s"
+        f" {results['split_texts']['chunks_per_sec']:9.1f} chunks/s",
+        f"  token_chunker  {results['token_chunker']['pages_per_sec']:9.1f} pages/s"
+        f" {results['token_chunker']['chunks_per_sec']:9.1f} chunks/s"
+        f"  {results['token_chunker']['vs_split_texts']:.2f}x split_texts",
+        f"  add_documents  {index['chunks_per_sec']:27.1f} chunks/s  peak RSS {index['peak_rss_mb']:.0f} MB",
+    ]
+    for stage in ("query", "hybrid_search", "answer"):
+        stats = results[stage]
+        lines.append(f"  {stage:<14} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms"
+                     f"  p99 {stats['p99_ms']:7.2f} ms")
+    return "\n".join(lines)
+
+
+def _flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    flat = {}
+    for scale, stages in results["scales"].items():
+        for stage, values in stages.items():
+            if stage == "stages":
+                continue
+            for metric, value in values.items():
+                if metric in METRIC_DIRECTIONS:
+                    flat[f"{scale}.{stage}.{metric}"] = value
+    return flat
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Compare a run with a baseline run.
+    Args:
+        results: Output of run_benchmarks
+        baseline: A stored output of run_benchmarks
+        tolerance: Allowed relative change in the bad direction, e.g. 0.2 for 20%
+    Returns:
+        List[Dict[str, Any]]: One row per metric present in both runs, with ``change`` (relative,
+        positive = better) and ``regressed``
+    """
+    current, previous = _flatten(results), _flatten(baseline)
+    rows = []
+    for key in sorted(set(current) & set(previous)):
+        direction = METRIC_DIRECTIONS[key.rsplit(".", 1)[1]]
+        if not previous[key]:
+            continue
+        change = direction * (current[key] - previous[key]) / previous[key]
+        rows.append({
+            "metric": key,
+            "baseline": previous[key],
+            "current": current[key],
+            "change": change,
+            "regressed": change < -tolerance,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Offline ingestion and query benchmark (fake embedder, stubbed LLM, no network)"
+    )
+    parser.add_argument("--pdf", action="append", help="Source PDF (repeatable; defaults to the sample PDFs)")
+    parser.add_argument("--scales", default="1,4", help="Comma-separated corpus scale factors")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per latency measurement")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (default 0.2)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on regressions")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.pdf or DEFAULT_PDFS,
+        [int(scale) for scale in args.scales.split(",")],
+        args.queries,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        seed=args.seed,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("environment", {}).get("packages") != results["environment"]["packages"]:
+        print(f"Package versions differ from the baseline: {baseline.get('environment', {}).get('packages')}")
+    rows = compare(results, baseline, args.tolerance)
+    print(f"\nComparison with {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for row in rows:
+        flag = "REGRESSED" if row["regressed"] else ""
+        print(f"  {row['metric']:<40} {row['baseline']:12.2f} -> {row['current']:12.2f}  {row['change']:+7.1%} {flag}")
+    regressions = [row for row in rows if row["regressed"]]
+    print(f"{len(regressions)} regression(s)")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,10 @@ from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
 
+# Concurrent retrieval / web search and context selection
+from app.orchestrator import gather_context
+from app.retrieval.context import distance_to_similarity, filter_by_similarity, merge_overlapping_chunks, pack_context
+
 # --- Set Google API Key ---
 os.environ["GOOGLE_API_KEY"] = "YOUR_API_KEY"
 
@@ -124,11 +128,21 @@ def process_web(url: str):
     return []
 
 # --- Retrieve Documents from ChromaDB ---
-def retrieve_documents(prompt, vector_store, COLLECTION_NAME, similarity_threshold):
+def retrieve_documents(prompt, vector_store, COLLECTION_NAME, similarity_threshold, max_context_tokens=3000):
+    """Retrieves chunks above the similarity threshold, merges overlapping ones and packs them into the token budget."""
     vector_store = chroma_client.client.get_collection(name=COLLECTION_NAME)
-    results = vector_store.query(query_texts=[prompt], n_results=5)
-    docs = results.get('documents', [])
-    has_docs = len(docs) > 0
+    results = vector_store.query(query_texts=[prompt], n_results=5, include=["documents", "metadatas", "distances"])
+    space = (vector_store.metadata or {}).get("hnsw:space", "l2")
+    hits = [
+        {"id": doc_id, "document": doc, "metadata": metadata, "similarity": distance_to_similarity(distance, space)}
+        for doc_id, doc, metadata, distance in zip(
+            results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+        )
+    ]
+    hits = filter_by_similarity(hits, similarity_threshold)
+    hits = pack_context(merge_overlapping_chunks(hits), max_context_tokens)
+    docs = [[hit["document"] for hit in hits]]
+    has_docs = len(docs[0]) > 0
     return docs, has_docs
 
 # --- RAG & Web Search Agents ---
@@ -204,20 +218,24 @@ if prompt:
   with st.chat_message("user"):
     st.write(prompt)
 
-  context, docs = "", []
+  # Retrieval and web search run concurrently; the web search is dropped if documents answer
+  retrieve_fn, web_fn = None, None
   if not st.session_state.force_web_search and st.session_state.rag_enabled:
-    docs, has_docs = retrieve_documents(prompt, chroma_client, COLLECTION_NAME, st.session_state.similarity_threshold)
-    if has_docs:
-      flattened_docs = [paragraph for doc in docs for paragraph in doc]
-      # Join the paragraphs with double newline characters
-      context = "\n\n".join(flattened_docs)
-
-  if (st.session_state.force_web_search or not context) and st.session_state.use_web_search:
-    with st.spinner("🔍 Searching the web..."):
-      web_search_agent = get_web_search_agent()
-      web_results = web_search_agent.run(prompt).content
-      if web_results:
-        context = f"Web Search Results:\n{web_results}"
+    similarity_threshold = st.session_state.similarity_threshold
+    retrieve_fn = lambda: retrieve_documents(prompt, chroma_client, COLLECTION_NAME, similarity_threshold)
+  if st.session_state.use_web_search:
+    web_fn = lambda: get_web_search_agent().run(prompt).content
+
+  context = ""
+  with st.spinner("🔍 Retrieving context..."):
+    gathered = gather_context(retrieve_fn, web_fn, accept=lambda result: any(result[0]))
+  if gathered["source"] == "documents":
+    docs, _ = gathered["retrieval"]
+    flattened_docs = [paragraph for doc in docs for paragraph in doc]
+    # Join the paragraphs with double newline characters
+    context = "\n\n".join(flattened_docs)
+  elif gathered["web_results"]:
+    context = f"Web Search Results:\n{gathered['web_results']}"
 
   with st.spinner("🤖 Generating response..."):
     rag_agent = get_rag_agent()
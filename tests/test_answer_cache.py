@@ -0,0 +1,40 @@
+from app.utils.answer_cache import SemanticAnswerCache, context_fingerprint
+
+
+def test_hit_needs_a_similar_query_and_the_same_retrieved_chunks():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    fingerprint = context_fingerprint(["doc-1", "doc-2"], "rag")
+    cache.put([1.0, 0.0, 0.1], fingerprint, "cached answer")
+
+    # Same chunks in another order, near-identical query
+    assert cache.get([2.0, 0.0, 0.2], context_fingerprint(["doc-2", "doc-1"], "rag")) == "cached answer"
+    # Different chunks, different mode or a dissimilar query miss
+    assert cache.get([1.0, 0.0, 0.1], context_fingerprint(["doc-1", "doc-3"], "rag")) is None
+    assert cache.get([1.0, 0.0, 0.1], context_fingerprint(["doc-1", "doc-2"], "web")) is None
+    assert cache.get([0.0, 1.0, 0.0], fingerprint) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    first, second, third = (context_fingerprint([name]) for name in ("a", "b", "c"))
+    cache.put([1.0, 0.0], first, "first")
+    cache.put([1.0, 0.0], second, "second")
+    assert cache.get([1.0, 0.0], first) == "first"
+
+    cache.put([1.0, 0.0], third, "third")
+
+    assert cache.get([1.0, 0.0], second) is None
+    assert cache.get([1.0, 0.0], first) == "first"
+    assert cache.get([1.0, 0.0], third) == "third"
+    assert cache.stats()["entries"] == 2
+    assert second not in cache._by_fingerprint
+
+
+def test_expired_entries_miss():
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    fingerprint = context_fingerprint(["doc-1"])
+    cache.put([1.0], fingerprint, "stale")
+    cache._entries[next(iter(cache._entries))]["created"] -= 61
+    assert cache.get([1.0], fingerprint) is None
+    assert cache.stats()["entries"] == 0
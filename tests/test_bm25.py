@@ -0,0 +1,45 @@
+from app.retrieval.bm25 import BM25Index
+from app.retrieval.embeddings import HashingEmbeddings
+from app.retrieval.vectorstore import VectorStore
+
+
+def _store(persist_directory):
+    return VectorStore(persist_directory=persist_directory, collection_name="test_docs",
+                       embedding_function=HashingEmbeddings())
+
+
+def test_search_sees_writes_from_another_store_with_the_same_count(tmp_path):
+    writer, reader = _store(str(tmp_path)), _store(str(tmp_path))
+    writer.add_documents(docs=["zebra crossing rules"], metadatas=[{"n": 0}], ids=["old"])
+    assert [hit["id"] for hit in reader.search("zebra", n_results=1)] == ["old"]
+
+    writer.delete(ids=["old"])
+    writer.add_documents(docs=["giraffe feeding schedule"], metadatas=[{"n": 1}], ids=["new"])
+    assert reader.lexical_index.search("zebra") == []
+    assert [doc_id for doc_id, _ in reader.lexical_index.search("giraffe")] == ["new"]
+
+
+def test_search_does_not_rebuild_when_counts_differ(tmp_path, monkeypatch):
+    store = _store(str(tmp_path))
+    store.add_documents(docs=["alpha beta"], metadatas=[{"n": 0}], ids=["a"])
+    # A chunk another process has written to Chroma but not yet to the lexical index
+    store.collection.add(ids=["b"], documents=["gamma"], embeddings=[HashingEmbeddings().embed_query("gamma")])
+    monkeypatch.setattr(store, "rebuild_lexical_index", lambda *args, **kwargs: 1 / 0)
+    assert [hit["id"] for hit in store.search("alpha", n_results=1)] == ["a"]
+
+
+def test_compaction_keeps_lines_appended_by_another_index(tmp_path):
+    path = str(tmp_path / "docs_bm25")
+    first, second = BM25Index(path), BM25Index(path)
+    first.add(["a"], ["apple pie"])
+    assert len(second) == 1
+    first.add(["b"], ["banana bread"])
+    # second has not searched since "b" was appended; compaction must not drop it
+    second.compact()
+    first.add(["c"], ["cherry tart"])
+
+    fresh = BM25Index(path)
+    assert sorted(doc_id for doc_id, _ in fresh.search("apple banana cherry")) == ["a", "b", "c"]
+    assert [doc_id for doc_id, _ in first.search("cherry")] == ["c"]
+    assert [doc_id for doc_id, _ in second.search("banana")] == ["b"]
+    assert len(first) == len(second) == 3
@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+from app.retrieval.chunker import TokenChunker
+
+PIECES = ["word", "ab", "x", "42", "é", "日本", ".", "!", "?", ",", "-", " ", "  ", "\t", "\n", "\n\n", " \n \n"]
+
+
+def _texts():
+    rng = random.Random(0)
+    texts = ["", "   ", "a", " a ", "a.", "\n\nfoo\n\n", "One. Two! Three?\n\nFour five six."]
+    texts += ["".join(rng.choice(PIECES) for _ in range(rng.randint(1, 400))) for _ in range(500)]
+    return texts
+
+
+@pytest.mark.parametrize("chunk_tokens,overlap_tokens,boundary_window",
+                         [(256, 32, 48), (10, 3, 4), (5, 0, 4), (3, 2, 48), (1, 0, 0), (8, 7, 1), (20, 5, 0)])
+def test_offset_walk_matches_the_token_list_walk(chunk_tokens, overlap_tokens, boundary_window):
+    chunker = TokenChunker(chunk_tokens, overlap_tokens, boundary_window)
+    for text in _texts():
+        assert list(chunker._split_regex(text)) == list(chunker._split_token_pieces(text))
+
+
+def test_chunks_end_at_sentence_ends_and_record_offsets():
+    text = "First sentence here. " * 10
+    chunker = TokenChunker(chunk_tokens=10, overlap_tokens=2, boundary_window=5)
+    spans = list(chunker.split_text_spans(text))
+    assert spans[0] == (0, text.index(".", 20) + 1, 8)
+    for start, end, _ in spans[:-1]:
+        assert text[end - 1] == "."
+    assert spans[-1][1] == len(text.rstrip())
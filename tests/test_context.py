@@ -0,0 +1,48 @@
+from app.retrieval.context import estimate_tokens, filter_by_similarity, merge_overlapping_chunks, pack_context
+
+
+def _hit(hit_id, document, file_name="a.pdf", similarity=None):
+    return {"id": hit_id, "document": document, "metadata": {"file_name": file_name}, "similarity": similarity}
+
+
+def _joined_tokens(hits):
+    return estimate_tokens("\n\n".join(hit["document"] for hit in hits))
+
+
+def test_pack_context_stays_within_the_budget_and_keeps_rank_order():
+    hits = [_hit("1", "a" * 200), _hit("2", "b" * 400), _hit("3", "c" * 80), _hit("4", "d" * 40)]
+    packed = pack_context(hits, max_tokens=90)
+    # 50 tokens, then the 100-token hit is skipped for the two small ones
+    assert [hit["id"] for hit in packed] == ["1", "3", "4"]
+    assert _joined_tokens(packed) <= 90
+    assert pack_context(hits, max_tokens=None) is hits
+
+
+def test_pack_context_truncates_a_top_hit_larger_than_the_budget():
+    packed = pack_context([_hit("1", "a" * 1000), _hit("2", "b" * 100)], max_tokens=50)
+    assert [hit["id"] for hit in packed] == ["1"]
+    assert estimate_tokens(packed[0]["document"]) <= 50
+
+
+def test_neighbouring_chunks_of_a_file_are_merged_at_the_better_rank():
+    shared = " the overlapping boundary between both chunks "
+    first = "Opening of the section." + shared
+    second = shared + "Closing of the section."
+    merged = merge_overlapping_chunks([_hit("2", second), _hit("x", "Unrelated text."), _hit("1", first)])
+    assert [hit["id"] for hit in merged] == ["2", "x"]
+    assert merged[0]["document"] == "Opening of the section." + shared + "Closing of the section."
+    assert merged[0]["merged_ids"] == ["2", "1"]
+
+
+def test_duplicates_are_dropped_but_other_files_are_not_joined():
+    shared = " the overlapping boundary between both chunks "
+    hits = [_hit("1", "Start." + shared), _hit("2", shared + "End.", file_name="b.pdf"), _hit("3", "Start.")]
+    merged = merge_overlapping_chunks(hits)
+    assert [hit["id"] for hit in merged] == ["1", "2"]
+    assert merged[0]["merged_ids"] == ["1", "3"]
+
+
+def test_filter_by_similarity_keeps_hits_without_a_score():
+    hits = [_hit("1", "a", similarity=0.9), _hit("2", "b", similarity=0.2), _hit("3", "c")]
+    assert [hit["id"] for hit in filter_by_similarity(hits, 0.5)] == ["1", "3"]
+    assert filter_by_similarity(hits, None) is hits
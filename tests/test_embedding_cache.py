@@ -0,0 +1,36 @@
+import sqlite3
+
+from app.retrieval.embedding_cache import CachedEmbeddings
+from app.retrieval.embeddings import HashingEmbeddings
+
+
+def _table_totals(cache):
+    return cache._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+
+
+def test_running_totals_follow_inserts_and_evictions(tmp_path):
+    cache = CachedEmbeddings(HashingEmbeddings(dimension=8), str(tmp_path / "cache.sqlite3"), max_entries=10)
+    cache.embed_documents([f"text {i}" for i in range(6)])
+    cache.embed_documents([f"text {i}" for i in range(4, 12)])
+    cache.embed_query("text 0")
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == _table_totals(cache) == (10, 10 * 8 * 4)
+
+    cache._store({cache._key("document", "text 11"): [0.0] * 16})
+    assert cache._totals() == _table_totals(cache)
+    cache.clear()
+    assert cache._totals() == (0, 0)
+
+
+def test_totals_are_seeded_from_an_existing_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)")
+    connection.executemany("INSERT INTO embeddings VALUES (?, ?, 0)", [(str(i), b"\0" * 32) for i in range(5)])
+    connection.commit()
+    connection.close()
+
+    cache = CachedEmbeddings(HashingEmbeddings(dimension=8), path, max_entries=6)
+    assert cache._totals() == (5, 160)
+    cache.embed_documents(["a", "b"])
+    assert cache._totals() == _table_totals(cache) == (6, 192)
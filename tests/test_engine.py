@@ -0,0 +1,69 @@
+import app.engine as engine_module
+from app.engine import RAGEngine
+from app.retrieval.embeddings import HashingEmbeddings
+from app.utils.answer_cache import SemanticAnswerCache
+from app.utils.deepseek_llm import GroqAPIError
+
+
+def _engine(persist_directory):
+    return RAGEngine(persist_directory=persist_directory, collection_name="test_docs",
+                     embedding_function=HashingEmbeddings(), answer_cache=SemanticAnswerCache())
+
+
+def _failing_stream(question, context=""):
+    yield "The answer is"
+    raise GroqAPIError("Read timed out")
+
+
+def test_stream_that_fails_part_way_is_flagged_and_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine_module, "stream_groq_deepseek", _failing_stream)
+    engine = _engine(str(tmp_path / "db"))
+
+    result, tokens = engine.answer_stream("What is the answer?")
+    text = "".join(tokens)
+    assert text == "The answer is\n\n[Groq API Error] Read timed out"
+    assert result["error"] == "[Groq API Error] Read timed out"
+    assert result["raw_answer"] == "The answer is"
+
+    monkeypatch.setattr(engine_module, "stream_groq_deepseek", lambda question, context="": iter(["Forty-two."]))
+    result, tokens = engine.answer_stream("What is the answer?")
+    assert "".join(tokens) == "Forty-two." and not result["cached"] and result["error"] is None
+    result, tokens = engine.answer_stream("What is the answer?")
+    assert "".join(tokens) == "Forty-two." and result["cached"]
+
+
+def test_failed_completion_is_reported_and_not_cached(tmp_path, monkeypatch):
+    def fail(question, context=""):
+        raise GroqAPIError("503 Service Unavailable")
+
+    monkeypatch.setattr(engine_module, "call_groq_deepseek", fail)
+    engine = _engine(str(tmp_path / "db"))
+    result = engine.answer("What is the answer?")
+    assert result["error"] == result["answer"] == "[Groq API Error] 503 Service Unavailable"
+    assert engine.answer("What is the answer?")["cached"] is False
+
+
+class _FailingGemini:
+    def invoke(self, prompt):
+        raise ValueError("quota exhausted")
+
+    def stream(self, prompt):
+        yield type("Chunk", (), {"content": "Partial summary"})()
+        raise ValueError("quota exhausted")
+
+
+def test_gemini_failures_are_reported_and_not_cached(tmp_path, monkeypatch):
+    import app.utils.gemini_summarizer as gemini_module
+    import app.utils.web_search as web_search_module
+    monkeypatch.setattr(web_search_module, "duckduckgo_search", lambda question: "Some web results")
+    monkeypatch.setattr(gemini_module, "get_gemini_model", lambda: _FailingGemini())
+    engine = _engine(str(tmp_path / "db"))
+
+    result = engine.answer("What is new?", web_search=True)
+    assert result["source"] == "web"
+    assert result["error"] == result["answer"] == "[Gemini API Error] quota exhausted"
+
+    result, tokens = engine.answer_stream("What is new?", web_search=True)
+    assert "".join(tokens) == "Partial summary\n\n[Gemini API Error] quota exhausted"
+    assert result["error"] == "[Gemini API Error] quota exhausted" and not result["cached"]
+    assert engine.answer("What is new?", web_search=True)["cached"] is False
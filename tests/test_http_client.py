@@ -0,0 +1,73 @@
+import socket
+
+import pytest
+import requests
+
+from app.utils.http_client import ProviderClient
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+    def close(self):
+        pass
+
+
+def _record_calls(client):
+    calls = []
+    send = client.session.request
+    client.session.request = lambda method, url, **kwargs: calls.append(method) or send(method, url, **kwargs)
+    return calls
+
+
+def _client(responses):
+    client = ProviderClient("test", max_retries=3, base_delay=0, timeout=(1, 0.2))
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append(method)
+        return _Response(responses.pop(0))
+
+    client.session.request = request
+    return client, calls
+
+
+@pytest.fixture
+def silent_server():
+    # The kernel completes the handshake for a listening socket, but nothing ever answers
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(8)
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/"
+    server.close()
+
+
+def test_post_is_not_resent_after_a_read_timeout(silent_server):
+    client = ProviderClient("test", max_retries=3, base_delay=0, timeout=(1, 0.2))
+    calls = _record_calls(client)
+    with pytest.raises(requests.ReadTimeout):
+        client.request("POST", silent_server, json={})
+    assert calls == ["POST"]
+    with pytest.raises(requests.ReadTimeout):
+        client.request("GET", silent_server)
+    assert calls == ["POST"] + ["GET"] * 4
+
+
+def test_post_is_resent_when_the_connection_is_refused():
+    client = ProviderClient("test", max_retries=2, base_delay=0)
+    calls = _record_calls(client)
+    with pytest.raises(requests.ConnectionError):
+        client.request("POST", "http://127.0.0.1:9/", json={})
+    assert calls == ["POST"] * 3
+
+
+def test_post_is_only_resent_on_statuses_that_were_not_processed():
+    client, calls = _client([503, 429, 200])
+    assert client.request("POST", "http://example.invalid/").status_code == 200
+    assert len(calls) == 3
+    client, calls = _client([500, 200])
+    assert client.request("POST", "http://example.invalid/").status_code == 500
+    client, calls = _client([500, 200])
+    assert client.request("GET", "http://example.invalid/").status_code == 200
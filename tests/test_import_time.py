@@ -0,0 +1,12 @@
+from benchmarks.import_time import IMPORT_BUDGETS_MS, check_budgets
+
+# Budgets are set for a developer machine; CI runners get four times as long before failing
+SCALE = 4
+
+
+def test_entry_points_import_within_budget_and_defer_heavy_modules():
+    rows = check_budgets({module: ms * SCALE for module, ms in IMPORT_BUDGETS_MS.items()}, repeat=2)
+    over_budget = {row["module"]: round(row["ms"]) for row in rows if row["over_budget"]}
+    eager = {row["module"]: row["eager"] for row in rows if row["eager"]}
+    assert not over_budget, f"cold import over {SCALE}x budget (ms): {over_budget}"
+    assert not eager, f"heavy modules imported eagerly: {eager}"
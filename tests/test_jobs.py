@@ -0,0 +1,153 @@
+import io
+import os
+import socket
+import threading
+import time
+
+from app.jobs import DONE, FAILED, QUEUED, RUNNING, IngestQueue
+
+
+def _upload(name, content=None):
+    file = io.BytesIO(content if content is not None else name.encode())
+    file.name = name
+    return file
+
+
+def _queue(tmp_path, **kwargs):
+    return IngestQueue(str(tmp_path / "jobs.sqlite"), **kwargs)
+
+
+def _spooled(queue):
+    return sorted(os.listdir(queue.spool_directory))
+
+
+def _set_lease(queue, job_id, owner, heartbeat):
+    queue._conn.execute("UPDATE jobs SET owner = ?, heartbeat = ? WHERE id = ?", (owner, heartbeat, job_id))
+
+
+def _dead_pid():
+    pid = 1 << 22
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid += 1
+
+
+def test_claim_takes_the_oldest_tenant_one_version_per_file(tmp_path):
+    queue = _queue(tmp_path)
+    a1 = queue.enqueue(_upload("a.pdf", b"v1"), tenant="alice")
+    b1 = queue.enqueue(_upload("b.pdf"), tenant="bob")
+    a2 = queue.enqueue(_upload("a.pdf", b"v2"), tenant="alice")
+    a3 = queue.enqueue(_upload("c.pdf"), tenant="alice")
+
+    jobs = queue.claim("worker:1", limit=5)
+
+    assert [job["id"] for job in jobs] == [a1, a3]
+    assert {job["status"] for job in jobs} == {RUNNING}
+    assert queue.get(a2)["status"] == QUEUED
+    assert queue.get(b1)["status"] == QUEUED
+
+
+def test_a_tenant_with_a_running_job_is_not_claimed_again(tmp_path):
+    queue = _queue(tmp_path)
+    a1 = queue.enqueue(_upload("a.pdf"), tenant="alice")
+    a2 = queue.enqueue(_upload("b.pdf"), tenant="alice")
+    b1 = queue.enqueue(_upload("c.pdf"), tenant="bob")
+
+    assert [job["id"] for job in queue.claim("worker:1")] == [a1]
+    assert [job["id"] for job in queue.claim("worker:2")] == [b1]
+    assert queue.claim("worker:3") == []
+
+    queue.finish(a1, DONE)
+    assert [job["id"] for job in queue.claim("worker:3")] == [a2]
+
+
+def test_enqueue_spools_once_and_finish_drops_the_copy(tmp_path):
+    queue = _queue(tmp_path)
+    job_id = queue.enqueue(_upload("a.pdf"), tenant="alice")
+    assert queue.enqueue(_upload("a.pdf"), tenant="alice") == job_id
+    assert len(_spooled(queue)) == 1
+
+    [job] = queue.claim("worker:1")
+    with open(job["path"], "rb") as spooled:
+        assert spooled.read() == b"a.pdf"
+    queue.progress(job_id, "indexing", 3, 4)
+    assert queue.get(job_id)["progress"] == 0.75
+
+    queue.finish(job_id, DONE)
+    assert queue.get(job_id)["progress"] == 1.0
+    assert _spooled(queue) == []
+    assert queue.summary("alice")[DONE] == 1
+
+
+def test_concurrent_enqueues_of_one_upload_make_one_job(tmp_path):
+    queues = [_queue(tmp_path) for _ in range(4)]
+    start = threading.Barrier(len(queues))
+    ids = []
+
+    def enqueue(queue):
+        start.wait()
+        ids.append(queue.enqueue(_upload("a.pdf"), tenant="alice"))
+
+    threads = [threading.Thread(target=enqueue, args=(queue,)) for queue in queues]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 1
+    assert len(queues[0].jobs()) == 1
+    assert len(_spooled(queues[0])) == 1
+
+
+def test_requeue_stale_requeues_expired_leases_on_any_host(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=60)
+    expired = queue.enqueue(_upload("a.pdf"), tenant="alice")
+    renewed = queue.enqueue(_upload("b.pdf"), tenant="bob")
+    dead = queue.enqueue(_upload("c.pdf"), tenant="carol")
+    for tenant_jobs in (queue.claim("elsewhere:1"), queue.claim("elsewhere:2"), queue.claim("local")):
+        assert len(tenant_jobs) == 1
+    _set_lease(queue, expired, "other-host:123", time.time() - 120)
+    _set_lease(queue, renewed, "other-host:456", time.time() - 120)
+    queue.heartbeat([renewed])
+    _set_lease(queue, dead, f"{socket.gethostname()}:{_dead_pid()}", time.time())
+
+    assert queue.requeue_stale() == 2
+
+    assert queue.get(expired)["status"] == QUEUED
+    assert queue.get(dead)["status"] == QUEUED
+    assert queue.get(renewed)["status"] == RUNNING
+    assert [job["id"] for job in queue.claim("worker:1")] == [expired]
+
+
+def test_requeue_stale_fails_a_job_after_max_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2, lease_seconds=60)
+    job_id = queue.enqueue(_upload("a.pdf"))
+    for attempt in range(2):
+        queue.claim("other-host:1")
+        _set_lease(queue, job_id, "other-host:1", time.time() - 120)
+        queue.requeue_stale()
+
+    job = queue.get(job_id)
+    assert job["status"] == FAILED
+    assert job["attempts"] == 2
+    assert _spooled(queue) == []
+
+
+def test_purge_finished_keeps_active_and_recent_jobs(tmp_path):
+    queue = _queue(tmp_path)
+    old = queue.enqueue(_upload("a.pdf"), tenant="alice")
+    recent = queue.enqueue(_upload("b.pdf"), tenant="bob")
+    queued = queue.enqueue(_upload("c.pdf"), tenant="carol")
+    queue.claim("worker:1")
+    queue.claim("worker:1")
+    queue.finish(old, DONE)
+    queue.finish(recent, FAILED, "broken")
+    queue._conn.execute("UPDATE jobs SET finished = ? WHERE id = ?", (time.time() - 8 * 86400, old))
+
+    assert queue.purge_finished() == 1
+    assert [job["id"] for job in queue.jobs()] == [recent, queued]
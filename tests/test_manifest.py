@@ -0,0 +1,116 @@
+import os
+import shutil
+
+import pytest
+
+from app.engine import RAGEngine, open_local_files
+from app.retrieval.manifest import QuotaExceededError
+from app.retrieval.embeddings import HashingEmbeddings
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "doc2.pdf")
+OTHER_PDF = os.path.join(os.path.dirname(__file__), "..", "The Rise of Generative AI in Creative Industries (1).pdf")
+
+
+def _engine(persist_directory):
+    return RAGEngine(persist_directory=persist_directory, collection_name="test_docs",
+                     embedding_function=HashingEmbeddings(), answer_cache=False)
+
+
+def test_identical_files_under_different_names_keep_their_own_chunks(tmp_path):
+    paths = []
+    for name in ("a.pdf", "b.pdf"):
+        path = tmp_path / name
+        shutil.copyfile(SAMPLE_PDF, path)
+        paths.append(str(path))
+    engine = _engine(str(tmp_path / "db"))
+    files = open_local_files(paths)
+    try:
+        indexed, _ = engine.ingest(files)
+    finally:
+        for file in files:
+            file.close()
+    assert sorted(indexed) == ["a.pdf", "b.pdf"]
+    chunks_a = engine.manifest.chunk_ids("a.pdf")
+    assert not set(chunks_a) & set(engine.manifest.chunk_ids("b.pdf"))
+    assert engine.vector_store.collection.count() == 2 * len(chunks_a)
+
+    assert engine.remove_files(["b.pdf"]) == ["b.pdf"]
+    assert engine.vector_store.collection.count() == len(chunks_a)
+    assert len(engine.vector_store.collection.get(ids=chunks_a)["ids"]) == len(chunks_a)
+
+
+def test_engines_sharing_a_manifest_do_not_drop_each_others_files(tmp_path):
+    for name in ("a.pdf", "new.pdf"):
+        shutil.copyfile(SAMPLE_PDF, tmp_path / name)
+    persist_directory = str(tmp_path / "db")
+    first, second = _engine(persist_directory), _engine(persist_directory)
+    for engine, name in ((first, "a.pdf"), (second, "new.pdf")):
+        files = open_local_files([str(tmp_path / name)])
+        engine.ingest(files, prune=False)
+        files[0].close()
+
+    # first never saw new.pdf in memory; its removal must not rewrite the manifest without it
+    assert first.remove_files(["a.pdf"]) == ["a.pdf"]
+    assert second.indexed_files() == ["new.pdf"]
+    assert first.indexed_files() == ["new.pdf"]
+
+
+class _FailingEmbeddings(HashingEmbeddings):
+    """Embedder whose embed_documents fails once it has been called fail_after times."""
+
+    def __init__(self, fail_after: int):
+        super().__init__()
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls > self.fail_after:
+            raise ValueError("embedding backend unavailable")
+        return super().embed_documents(texts)
+
+
+def test_failed_ingest_leaves_no_partially_written_chunks(tmp_path):
+    embedder = _FailingEmbeddings(fail_after=2)
+    engine = RAGEngine(persist_directory=str(tmp_path / "db"), collection_name="test_docs",
+                       embedding_function=embedder, answer_cache=False)
+    # Small sequential sub-batches: the first two are written before the third one fails
+    engine.vector_store.scheduler.batch_size = 2
+    engine.vector_store.scheduler.max_workers = 1
+    files = open_local_files([SAMPLE_PDF])
+    try:
+        indexed, _ = engine.ingest(files)
+    finally:
+        for file in files:
+            file.close()
+    assert indexed == []
+    assert embedder.calls > embedder.fail_after
+    assert engine.vector_store.collection.count() == 0
+    assert len(engine.vector_store.lexical_index) == 0
+
+
+def test_rejected_sync_keeps_the_indexed_version_of_changed_files(tmp_path):
+    engine = _engine(str(tmp_path / "db"))
+    engine.max_files = 1
+    path = tmp_path / "a.pdf"
+    shutil.copyfile(SAMPLE_PDF, path)
+    files = open_local_files([str(path)])
+    try:
+        engine.ingest(files)
+    finally:
+        for file in files:
+            file.close()
+    chunk_ids = engine.manifest.chunk_ids("a.pdf")
+
+    # A changed a.pdf plus a new b.pdf would make two files
+    shutil.copyfile(OTHER_PDF, path)
+    shutil.copyfile(SAMPLE_PDF, tmp_path / "b.pdf")
+    files = open_local_files([str(path), str(tmp_path / "b.pdf")])
+    try:
+        with pytest.raises(QuotaExceededError):
+            engine.ingest(files)
+    finally:
+        for file in files:
+            file.close()
+    assert engine.manifest.chunk_ids("a.pdf") == chunk_ids
+    assert engine.vector_store.collection.count() == len(chunk_ids)
@@ -0,0 +1,73 @@
+import re
+
+from app.utils.metrics import Histogram, MetricsRegistry, count, stage, traced
+
+SAMPLE = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+
+
+def _samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"not a valid sample line: {line!r}"
+        samples[(match["name"], match["labels"] or "")] = float(match["value"])
+    return samples
+
+
+def test_prometheus_histograms_are_cumulative_and_in_seconds():
+    registry = MetricsRegistry()
+    for duration_ms in (0.5, 3, 3, 40, 70000):
+        registry.observe("retrieval", duration_ms)
+    text = registry.to_prometheus()
+    samples = _samples(text)
+
+    assert text.endswith("\n")
+    assert "# TYPE luminarag_stage_duration_seconds histogram" in text
+    buckets = [(labels, value) for (name, labels), value in samples.items()
+               if name == "luminarag_stage_duration_seconds_bucket"]
+    assert [labels for labels, _ in buckets][:3] == [
+        'stage="retrieval",le="0.001"', 'stage="retrieval",le="0.0025"', 'stage="retrieval",le="0.005"']
+    assert buckets[-1] == ('stage="retrieval",le="+Inf"', 5)
+    values = [value for _, value in buckets]
+    assert values == sorted(values)
+    assert samples[("luminarag_stage_duration_seconds_bucket", 'stage="retrieval",le="0.005"')] == 3
+    assert samples[("luminarag_stage_duration_seconds_bucket", 'stage="retrieval",le="60"')] == 4
+    assert samples[("luminarag_stage_duration_seconds_count", 'stage="retrieval"')] == 5
+    assert abs(samples[("luminarag_stage_duration_seconds_sum", 'stage="retrieval"')] - 70.0465) < 1e-6
+
+
+def test_prometheus_counters_carry_their_labels():
+    registry = MetricsRegistry()
+    registry.increment("tokens", 120, kind="prompt")
+    registry.increment("tokens", 30, kind="completion")
+    registry.increment("tokens", 80, kind="prompt")
+    registry.increment("llm_errors")
+    text = registry.to_prometheus(prefix="app")
+    samples = _samples(text)
+
+    assert "# TYPE app_tokens_total counter" in text
+    assert samples[("app_tokens_total", 'kind="prompt"')] == 200
+    assert samples[("app_tokens_total", 'kind="completion"')] == 30
+    assert samples[("app_llm_errors_total", "")] == 1
+
+
+def test_histogram_quantiles_stay_inside_the_observed_range():
+    histogram = Histogram()
+    for duration_ms in range(1, 101):
+        histogram.observe(duration_ms)
+    assert 25 <= histogram.quantile(0.5) <= 50
+    assert 50 <= histogram.quantile(0.95) <= 100
+    assert histogram.quantile(1.0) == histogram.max == 100
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_stages_and_counts_are_recorded_on_the_current_trace():
+    with traced("question", mode="rag") as trace:
+        with stage("retrieval"):
+            pass
+        count("tokens", 12, kind="prompt")
+    assert trace.total_ms is not None
+    assert list(trace.timings()) == ["retrieval"]
+    assert trace.attributes == {"mode": "rag", "tokens_prompt": 12}
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from app.orchestrator import gather_context
+
+
+def _slow(value, seconds):
+    def run():
+        time.sleep(seconds)
+        return value
+    return run
+
+
+def _fail(message):
+    def run():
+        raise RuntimeError(message)
+    return run
+
+
+def test_accepted_retrieval_wins_without_waiting_for_the_web():
+    start = time.perf_counter()
+    context = gather_context(lambda: ["chunk"], _slow("web results", 2), web_timeout=5)
+    assert time.perf_counter() - start < 1
+    assert context["source"] == "documents"
+    assert context["retrieval"] == ["chunk"] and context["web_results"] is None
+    assert {"retrieval_ms", "context_ms"} <= set(context["timings"])
+
+
+@pytest.mark.parametrize("retrieve_fn", [lambda: [], _slow(["late chunk"], 1), _fail("index is locked")],
+                         ids=["empty", "timeout", "error"])
+def test_unusable_retrieval_falls_back_to_the_web(retrieve_fn):
+    context = gather_context(retrieve_fn, lambda: "web results", retrieval_timeout=0.2)
+    assert context["source"] == "web"
+    assert context["web_results"] == "web results"
+
+
+@pytest.mark.parametrize("web_fn", [_slow("late web results", 1), _fail("HTTP 503")], ids=["timeout", "error"])
+def test_web_timeout_or_failure_leaves_no_context(web_fn):
+    start = time.perf_counter()
+    context = gather_context(lambda: [], web_fn, web_timeout=0.2)
+    assert time.perf_counter() - start < 0.8
+    assert context["source"] is None
+    assert context["retrieval"] == [] and context["web_results"] is None
+
+
+def test_retrieval_error_without_web_search_is_raised():
+    with pytest.raises(RuntimeError, match="index is locked"):
+        gather_context(_fail("index is locked"))
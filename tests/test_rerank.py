@@ -0,0 +1,61 @@
+from app.retrieval.rerank import LexicalOverlapScorer, Reranker
+
+
+class _RecordingScorer:
+    name = "recording"
+
+    def __init__(self):
+        self.batches = []
+
+    def score_batch(self, query, texts):
+        self.batches.append(list(texts))
+        return [float(len(text)) for text in texts]
+
+
+def _hits(count):
+    return [{"id": f"chunk-{i}", "document": "x" * (i + 1)} for i in range(count)]
+
+
+def test_hits_are_scored_in_batches_and_ranked_by_score():
+    scorer = _RecordingScorer()
+    reranker = Reranker(scorer, batch_size=4)
+    ranked = reranker.rerank("query", _hits(10), top_k=3)
+    assert [len(batch) for batch in scorer.batches] == [4, 4, 2]
+    assert [hit["id"] for hit in ranked] == ["chunk-9", "chunk-8", "chunk-7"]
+    assert ranked[0]["rerank_score"] == 10.0
+    assert reranker.last_timings["scored"] == 10 and reranker.last_timings["cached"] == 0
+
+
+def test_cached_scores_are_reused_per_query():
+    scorer = _RecordingScorer()
+    reranker = Reranker(scorer, batch_size=4)
+    reranker.rerank("query", _hits(6))
+    scorer.batches.clear()
+
+    ranked = reranker.rerank("query", _hits(8), top_k=8)
+    assert scorer.batches == [["x" * 7, "x" * 8]]
+    assert reranker.last_timings["cached"] == 6 and reranker.last_timings["scored"] == 2
+    assert [hit["id"] for hit in ranked][:2] == ["chunk-7", "chunk-6"]
+
+    scorer.batches.clear()
+    reranker.rerank("another query", _hits(2))
+    assert len(scorer.batches) == 1
+
+
+def test_score_cache_keeps_the_most_recent_entries():
+    scorer = _RecordingScorer()
+    reranker = Reranker(scorer, cache_size=3)
+    reranker.rerank("query", _hits(5))
+    assert len(reranker._cache) == 3
+    scorer.batches.clear()
+    reranker.rerank("query", _hits(5)[2:])
+    assert scorer.batches == []
+
+
+def test_lexical_scorer_prefers_passages_with_the_query_terms_in_order():
+    scores = LexicalOverlapScorer().score_batch("vector index compaction", [
+        "Compaction of the vector index.",
+        "The vector index compaction step.",
+        "Unrelated passage.",
+    ])
+    assert scores[1] > scores[0] > scores[2] == 0.0
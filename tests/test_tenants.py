@@ -0,0 +1,31 @@
+import threading
+
+from app.retrieval.embeddings import HashingEmbeddings
+from app.tenants import TenantRegistry
+
+
+def test_engines_that_are_ingesting_are_not_evicted(tmp_path):
+    registry = TenantRegistry(str(tmp_path / "db"), "test_docs", max_open=1, embedding_function=HashingEmbeddings(),
+                              answer_cache=False)
+    alice = registry.get("alice")
+    started, finish = threading.Event(), threading.Event()
+
+    def ingest():
+        # Stands in for a long-running ingest on alice's engine
+        with alice._ingest_lock:
+            started.set()
+            finish.wait(10)
+
+    thread = threading.Thread(target=ingest)
+    thread.start()
+    started.wait(10)
+    try:
+        registry.get("bob")
+        assert registry.open_tenants() == ["alice", "bob"]
+        assert registry.get("alice") is alice
+    finally:
+        finish.set()
+        thread.join()
+
+    registry.get("bob")
+    assert registry.open_tenants() == ["bob"]
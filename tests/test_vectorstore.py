@@ -0,0 +1,66 @@
+import os
+import warnings
+
+from app.retrieval.embeddings import HashingEmbeddings
+from app.retrieval.vectorstore import ChromaEmbeddingAdapter, VectorStore
+
+
+def _store(persist_directory):
+    return VectorStore(persist_directory=persist_directory, collection_name="test_docs",
+                       embedding_function=HashingEmbeddings())
+
+
+def test_compact_shrinks_a_churned_store(tmp_path):
+    persist_directory = str(tmp_path / "db")
+    store = _store(persist_directory)
+    ids = [f"chunk-{i}" for i in range(2000)]
+    store.add_documents(docs=[f"document number {i} " * 40 for i in range(2000)],
+                        metadatas=[{"index": i} for i in range(2000)], ids=ids)
+    store.delete(ids=ids[:1800])
+    sqlite_path = os.path.join(persist_directory, "chroma.sqlite3")
+    sqlite_before = os.path.getsize(sqlite_path)
+
+    stats = store.compact()
+    assert stats["chunks"] == 200
+    assert stats["bytes_after"] < stats["bytes_before"]
+    assert os.path.getsize(sqlite_path) < sqlite_before
+
+    reopened = _store(persist_directory)
+    assert reopened.collection.count() == 200
+    assert reopened.collection.get(ids=["chunk-1999"])["ids"] == ["chunk-1999"]
+
+
+def test_embedding_function_config_round_trips_without_warnings(tmp_path):
+    persist_directory = str(tmp_path / "db")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        store = _store(persist_directory)
+        store.add_documents(docs=["hello world"], metadatas=[{"index": 0}], ids=["chunk-0"])
+        store = _store(persist_directory)
+    config = store.collection.configuration_json["embedding_function"]
+    assert config == {"type": "known", "name": "luminarag",
+                      "config": {"spec": "hashing:384", "model_name": "hashing-384"}}
+
+    # A collection opened without an embedder rebuilds it from the stored spec
+    collection = store.client.get_collection("test_docs")
+    adapter = collection.configuration["embedding_function"]
+    assert isinstance(adapter, ChromaEmbeddingAdapter) and adapter.spec == "hashing:384"
+    assert collection.query(query_texts=["hello"], n_results=1)["ids"] == [["chunk-0"]]
+
+
+def test_query_batch_matches_dense_search_per_query(tmp_path):
+    store = _store(str(tmp_path / "db"))
+    topics = ["vector index", "token budget", "web search", "answer cache", "job queue"]
+    store.add_documents(docs=[f"notes on the {topic}, part {i}" for topic in topics for i in range(4)],
+                        metadatas=[{"file_name": f"{topic}.pdf"} for topic in topics for _ in range(4)],
+                        ids=[f"{topic}-{i}" for topic in topics for i in range(4)])
+    queries = [f"what about the {topic}?" for topic in topics] + ["unrelated question"]
+
+    batched = store.query_batch(queries, n_results=3, batch_size=4)
+
+    assert len(batched) == len(queries)
+    for query, hits in zip(queries, batched):
+        assert len(hits) == 3
+        assert hits == store.search(query, n_results=3, hybrid=False)
+    filtered = store.query_batch(queries[:2], n_results=3, where={"file_name": "job queue.pdf"})
+    assert all(hit["metadata"]["file_name"] == "job queue.pdf" for hits in filtered for hit in hits)